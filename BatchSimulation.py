@@ -0,0 +1,117 @@
+""" Several independent ballrooms simulated together in one headless simulation.
+
+Small scenarios (10-30 couples) spend most of their time in the python overhead of every time-step,
+not in the physics. A BatchSimulation steps K ballrooms in one loop: all couples are stored in one
+CoupleTable, so the beats are scheduled once and the energy and velocity updates of Change are
+computed for all ballrooms at once.
+
+Every ballroom has its own BulletWorld (with its own floor) and its couples are placed with its own
+seed, so every ballroom gives exactly the results of the single simulation with the same seed
+(see Scenario.RunScenario): the solver of bullet does not depend on the bodies of the other ballrooms.
+All ballrooms use the same coordinates, the collisions are counted per ballroom and identifier,
+the results are returned (and stored) per ballroom.
+
+All ballrooms share the music (beats) and the end time.
+
+Example:
+ballrooms=[{'pairs':Scenario.MakeDancers(20),'seed':seed,'scenarioname':'run'+str(seed)} for seed in range(8)]
+results=BatchSimulation(ballrooms,Scenario.LoadBeats('Music/waltz_nr2.csv'),60.0).Run()
+"""
+import random
+import time
+
+from DanceClass import Simulation
+import TraceFile
+from Placement import Placement
+from Results import ResultStore
+
+class BatchSimulation(Simulation):
+	""" K independent ballrooms in one simulation (see above)
+	"""
+
+	def __init__(self,BALLROOMS,BEATS,tend=None,**options):
+		""" Input:
+		BALLROOMS (list(dict)) the ballrooms with the keys
+			'pairs' (list(dict)) specification of the couples (see Scenario.MakeDancers)
+			'seed' (int) seed of the random generator for the placement of the couples, None to continue with the current state
+			'scenarioname' (str) name of the ballroom in the results (optional)
+			'parameters' (dict) parameters that are saved together with the results (optional, see Results.ResultStore)
+		BEATS (list(float)) time-instants of the beats (or a BeatLibrary.BeatTrack), shared by all ballrooms
+		tend (float) endtime of the simulation (seconds), None to stop at the last beat
+		options further arguments of DanceClass.Simulation (e.g. ballroomsize, placement, physicsrate),
+			the simulation is always headless
+		"""
+		self.BALLROOMS=BALLROOMS
+		PAIRS=list()
+		for ballroom in BALLROOMS:
+			PAIRS+=ballroom['pairs']
+		Simulation.__init__(self,PAIRS,BEATS,tend,False,False,0,**options)
+
+	def PlaceCouples(self,Placed):
+		""" Creates a world with a floor for every ballroom and places its couples,
+		the random generator is seeded with the seed of the ballroom before
+		"""
+		self.BALLROOMSLICES=list() #couples of every ballroom in the CoupleTable
+		self.COLLISIONGROUPS=list()
+		for k,ballroom in enumerate(self.BALLROOMS):
+			if k>0: #the world of the first ballroom and its floor are created by DanceClass.Simulation
+				self.world=self.MakeWorld()
+				self.Worlds.append(self.world)
+				self.MakeFloor()
+			first=sum([len(x['pairs']) for x in self.BALLROOMS[:k]])
+			self.BALLROOMSLICES.append(slice(first,first+len(ballroom['pairs'])))
+			if ballroom.get('seed') is not None:
+				random.seed(ballroom['seed'])
+			placement=Placement(self.ballroomsize,3*self.bodyradius,self.placement)
+			placement.Place([x['pairdistance'] for x in ballroom['pairs']],lambda p1,p2,index:Placed(p1,p2,first+index))
+			self.COLLISIONGROUPS+=[(k,x['identifier']) for x in ballroom['pairs']]
+		self.world=self.Worlds[0]
+
+	def Run(self,scenarioname=None,resultfilename=None,tracefilename=None,checkpointfilename=None,checkpointevery=10,parameters=None):
+		""" Runs all ballrooms until the end time is reached (see DanceClass.Simulation.Run)
+
+		The traces of all ballrooms are written into one file, the couples of ballroom k are the
+		columns BALLROOMSLICES[k].
+
+		Output:
+		results (list(dict)) results of every ballroom (see finalStuff)
+		"""
+		return Simulation.Run(self,scenarioname,resultfilename,tracefilename,checkpointfilename,checkpointevery,parameters)
+
+	def finalStuff(self):
+		""" Splits the results into the ballrooms and adds them to the result file (if specified),
+		a .csv result file gets a ;-separated row per ballroom (see DanceClass.Simulation.AppendCSV)
+
+		Output:
+		results (list(dict)) for every ballroom the results as a single simulation (see DanceClass.Simulation.finalStuff)
+		"""
+		self.Profiler.Finish()
+		self.CloseTelemetry()
+		runtime=time.perf_counter()-self.runstart
+		episodes=self.EpisodeResults()
+		batch=list()
+		for k,ballroom in enumerate(self.BALLROOMS):
+			results=dict()
+			results['scenarioname']=ballroom.get('scenarioname',self.SCENARIONAME)
+			results['frames']=self.frames
+			results['time']=self.time
+			results['collisions']={identifier:value for (b,identifier),value in self.TOTALCOLLISIONS.items() if b==k}
+			results['couples']={identifier:value for (b,identifier),value in self.IDENTIFIERCOUNTS.items() if b==k}
+			if episodes is not None:
+				results['episodes']={identifier:value for (b,identifier),value in episodes.items() if b==k}
+			results['setup']=self.setuptime/len(self.BALLROOMS) #the time of the batch is shared equally
+			results['runtime']=runtime/len(self.BALLROOMS)
+			print(results['scenarioname'],results['collisions'])
+			batch.append(results)
+
+		if self.RESULTFILENAME is not None and self.RESULTFILENAME.endswith('.csv')==False:
+			store=ResultStore(self.RESULTFILENAME,len(batch))
+			for ballroom,results in zip(self.BALLROOMS,batch):
+				store.Add(results,ballroom.get('parameters',self.PARAMETERS))
+			store.Close()
+		elif self.RESULTFILENAME is not None: #one row per ballroom
+			for results in batch:
+				self.AppendCSV(results['scenarioname'],results['collisions'])
+		if self.JSONFILENAME is not None:
+			TraceFile.ToJSON(self.TRACEFILENAME,self.JSONFILENAME)
+		return batch
@@ -0,0 +1,126 @@
+""" Beat files of the music, loaded once and cached.
+
+A beat file is a ;-separated csv file with the time-instants (seconds) of the beats in the first column.
+Load parses a file only once per process (Load returns the same BeatTrack again as long as the file
+does not change, the beats are validated on every Load). The parsed beats are also cached on disk as .npy file named after the
+SHA-1 hash of the beat file, so other processes (e.g. the workers of a sweep) only read the binary
+array, memory-mapped and read-only.
+
+The frames of the beats for a time-step are computed on demand and memoized as well, so a simulation
+that gets a BeatTrack (see DanceClass.Simulation) does not compute them again.
+"""
+import csv
+import hashlib
+import os
+
+import numpy as np
+
+CACHEDIR=os.path.join(os.path.dirname(os.path.abspath(__file__)),'Music','.beatcache')
+
+_tracks=dict() # (path,modification time,size) -> BeatTrack
+
+class BeatTrack():
+	""" The beats of one music file
+	"""
+
+	def __init__(self,filename,beats,filehash=None):
+		""" Input:
+		filename (str) beat file
+		beats (numpy.array) time-instants of the beats (seconds)
+		filehash (str) SHA-1 hash of the beat file
+		"""
+		self.filename=filename
+		self.hash=filehash
+		self.beats=beats
+		self.__frames=dict()
+
+	def __len__(self):
+		return len(self.beats)
+
+	def Beats(self):
+		""" Output:
+		(list(float)) time-instants of the beats, as expected by DanceClass.Simulation
+		"""
+		return self.beats.tolist()
+
+	def Frames(self,dt):
+		""" Output:
+		(numpy.array int) frame of every beat for time-steps of length dt (before merging close beats, see BeatScheduler)
+		"""
+		if dt not in self.__frames:
+			frames=(self.beats/dt).astype(np.int64)
+			frames.flags.writeable=False
+			self.__frames[dt]=frames
+		return self.__frames[dt]
+
+def Validate(beats,filename='',minspacing=0.0):
+	""" Checks that the beats are finite, not negative, sorted and not closer than minspacing
+	(beats at the same time are allowed with minspacing 0, close beats are merged or shifted by BeatScheduler)
+
+	Input:
+	beats (numpy.array) time-instants of the beats
+	filename (str) name of the file (for the error message)
+	minspacing (float) minimum time between two beats (s), 0 to only require sorted beats
+	"""
+	if len(beats)==0:
+		raise ValueError(filename+': no beats')
+	if np.all(np.isfinite(beats))==False or beats[0]<0:
+		raise ValueError(filename+': the beats must be finite and not negative')
+	spacing=np.diff(beats)
+	if len(spacing)>0 and spacing.min()<0:
+		line=int(np.argmin(spacing))+2
+		raise ValueError(filename+': beat in line '+str(line)+' is before its predecessor (the beats must be sorted in time)')
+	if len(spacing)>0 and spacing.min()<minspacing:
+		line=int(np.argmin(spacing))+2
+		raise ValueError(filename+': beat in line '+str(line)+' is not at least '+str(minspacing)+' s after its predecessor')
+
+def Parse(filename):
+	""" Reads the first column of a beat file
+	"""
+	with open(filename,'r') as f:
+		R=csv.reader(f,delimiter=';')
+		return np.array([float(x[0]) for x in R if len(x)>0])
+
+def Load(filename,cachedir=CACHEDIR,minspacing=0.0):
+	""" Loads a beat file (see above)
+
+	Input:
+	filename (str) beat file
+	cachedir (str) folder of the disk cache, None to switch the disk cache off
+	minspacing (float) minimum time between two beats (s), see Validate
+
+	Output:
+	(BeatTrack) the beats
+	"""
+	stat=os.stat(filename)
+	key=(os.path.abspath(filename),stat.st_mtime_ns,stat.st_size)
+	if key in _tracks: #validated again, an earlier Load may have used another minspacing
+		track=_tracks[key]
+		Validate(track.beats,filename,minspacing)
+		return track
+
+	with open(filename,'rb') as f:
+		filehash=hashlib.sha1(f.read()).hexdigest()
+	beats=None
+	if cachedir is not None:
+		cachename=os.path.join(cachedir,filehash+'.npy')
+		try:
+			beats=np.load(cachename,mmap_mode='r')
+		except (OSError,ValueError):
+			beats=None
+	if beats is None:
+		beats=Parse(filename)
+		Validate(beats,filename,minspacing)
+		if cachedir is not None:
+			try:
+				os.makedirs(cachedir,exist_ok=True)
+				np.save(cachename+'.'+str(os.getpid())+'.tmp.npy',beats)
+				os.replace(cachename+'.'+str(os.getpid())+'.tmp.npy',cachename) #other processes never see a half written file
+			except OSError:
+				pass #no cache if the folder is not writable
+	else:
+		Validate(beats,filename,minspacing)
+
+	track=BeatTrack(filename,beats,filehash)
+	_tracks[key]=track
+	return track
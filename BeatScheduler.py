@@ -0,0 +1,72 @@
+class BeatScheduler():
+	""" Maps the beats of the music onto the frames of the simulation.
+	All beat frames and beat lengths are calculated once, so that the simulation
+	only needs a dictionary lookup per frame to know whether a beat occurs.
+
+	Beats can be too close to be resolved by the time-step (e.g. two beats
+	that fall into the same frame). Such beats are handled explicitly by the
+	policy:
+		'merge' - the later beat is dropped (the behaviour of earlier versions for minspacing=1)
+		'shift' - the later beat is moved to the first frame that keeps the minimum spacing
+	"""
+
+	def __init__(self,BEATS,dt,minspacing=1,policy='merge',frames=None):
+		""" Input:
+		BEATS (list(float)) list of seconds corrsponding to every first beat of the 3/4 times waltz music
+		dt (float) length of a time-step
+		minspacing (int) minimum number of frames between two beats
+		policy (str) 'merge' or 'shift', see above
+		frames (list(int)) frame of every beat (see BeatLibrary.BeatTrack.Frames), None to compute them from BEATS
+		"""
+		if policy not in ['merge','shift']:
+			raise ValueError('unknown beat policy: '+str(policy))
+		if any([b<a for a,b in zip(BEATS[:-1],BEATS[1:])]):
+			raise ValueError('the beats must be sorted in time')
+
+		self.dt=dt
+		self.minspacing=minspacing
+		self.policy=policy
+
+		self.BEATFRAMES=list() # frames of the beats that are danced
+		self.BEATLENGTHS=list() # number of frames since the previous beat (0 for the first beat)
+		self.DROPPED=list() # indices (in BEATS) of the beats that were merged into their predecessor
+		self.SHIFTED=list() # indices (in BEATS) of the beats that were moved to a later frame
+		if frames is None:
+			frames=[int(beat/dt) for beat in BEATS]
+		for index,frame in enumerate(frames):
+			if len(self.BEATFRAMES)>0 and frame-self.BEATFRAMES[-1]<minspacing:
+				if policy=='merge':
+					self.DROPPED.append(index)
+					continue
+				frame=self.BEATFRAMES[-1]+minspacing
+				self.SHIFTED.append(index)
+			if len(self.BEATFRAMES)>0:
+				self.BEATLENGTHS.append(frame-self.BEATFRAMES[-1])
+			else:
+				self.BEATLENGTHS.append(0)
+			self.BEATFRAMES.append(frame)
+
+		self.__lookup={frame:index for index,frame in enumerate(self.BEATFRAMES)}
+
+	def Beat(self,frame):
+		""" Checks whether a beat occurs in a frame
+
+		Input:
+		frame (int) frame of the simulation
+
+		Output:
+		index (int) number of the beat (0 for the first beat) or None if there is no beat in this frame
+		"""
+		return self.__lookup.get(frame)
+
+	def BeatLength(self,index):
+		""" Input:
+		index (int) number of the beat (see Beat)
+
+		Output:
+		(int) number of frames since the previous beat
+		"""
+		return self.BEATLENGTHS[index]
+
+	def __len__(self):
+		return len(self.BEATFRAMES)
@@ -0,0 +1,196 @@
+""" Reproducible benchmarks of the dance simulation.
+
+Every case of the benchmark matrix (number of couples x music file x skill mix x trace type)
+runs as a separate process, so that the peak memory of every case can be measured and the
+cases do not influence each other. Every case uses a fixed seed, so the collision checksums
+of two benchmark runs are equal as long as the simulation gives the same results.
+
+For every case the setup time (creation of the Simulation), frames/s, beats/s (only the beats that
+change the spins, i.e. without the first beat), the peak resident memory (RSS) and a checksum of the
+collision counts are saved into a JSON file. Two of these files can be compared with --compare.
+
+Trace types 1 and 2 only draw lines, so they are only benchmarked with --render (off-screen
+rendering, without a window), otherwise the simulation is headless and the trace type is ignored.
+
+The number of couples of a case is the totaldancers argument of Scenario.MakeDancers, which
+creates the perfect couples twice (spinning left and right), so a case can simulate more couples:
+the number of simulated couples is saved as 'simulatedcouples' and shown in the results.
+The floor grows with the number of simulated couples (the density of 30 couples on 40x20 m, see Run.py),
+so that large numbers of couples fit on it.
+
+Examples:
+python Benchmark.py --couples 10 30 100 --output Results/Benchmark.json
+python Benchmark.py --couples 10 30 100 --output Results/Benchmark_new.json --compare Results/Benchmark.json
+python Benchmark.py --couples 30 --tracetypes 0 1 2 --render
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+
+import BeatLibrary
+import Scenario
+
+#skill mixes of the couples (shares of Run.py), all other couples are perfect
+MIXES={
+	'perfect':{},
+	'slow':{'slowshare':0.3},
+	'mixed':{'slowshare':0.2,'distantshare':0.2,'awfulshare':0.1},
+}
+MUSICFILES=['Music/waltz_nr2.csv','Music/donauwalzer.csv']
+DENSITY=30/(40.0*20.0) #couples per square metre of the default scenario
+PREFIX='BENCHMARK ' #marks the line with the results in the output of a case
+
+def BallroomSize(couples):
+	""" Size of the floor, the default floor (40x20 m) is enlarged with the same aspect ratio
+	if the couples would be more crowded than in the default scenario
+	"""
+	scale=max(1.0,(couples/DENSITY/(40.0*20.0))**0.5)
+	return (40.0*scale,20.0*scale)
+
+def Checksum(collisions):
+	""" Checksum of the collision counts of a case
+	"""
+	return hashlib.sha1(json.dumps(collisions,sort_keys=True).encode()).hexdigest()[:16]
+
+def RunCase(case):
+	""" Runs one benchmark case in the current process
+
+	Input:
+	case (dict) 'couples' (totaldancers of Scenario.MakeDancers), 'musicfile', 'mix', 'tracetype', 'seed', 'tend' and 'render'
+
+	Output:
+	results (dict) the case together with the measured numbers
+	"""
+	if case['render']==True:
+		from panda3d.core import loadPrcFileData
+		loadPrcFileData('','window-type offscreen')
+		loadPrcFileData('','audio-library-name null')
+	import DanceClass
+
+	random.seed(case['seed'])
+	Dancers=Scenario.MakeDancers(case['couples'],**MIXES[case['mix']])
+	beats=BeatLibrary.Load(case['musicfile'])
+
+	start=time.perf_counter()
+	DC=DanceClass.Simulation(Dancers,beats,case['tend'],False,case['render'],case['tracetype'],ballroomsize=BallroomSize(len(Dancers)))
+	setup=time.perf_counter()-start
+	start=time.perf_counter()
+	results=DC.Run('benchmark',None,None)
+	run=time.perf_counter()-start
+
+	beatcount=len([x for x in DC.BEATFRAMES[1:] if x<results['frames']]) #the first beat only starts the dance, it runs no Change
+	measured=dict(case)
+	measured['simulatedcouples']=len(Dancers)
+	measured['ballroomsize']=list(DC.ballroomsize)
+	measured['setup']=setup
+	measured['run']=run
+	measured['frames']=results['frames']
+	measured['beats']=beatcount
+	measured['framespersecond']=results['frames']/run
+	measured['beatspersecond']=beatcount/run
+	measured['peakrss']=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024 #bytes (ru_maxrss is given in kB on Linux)
+	measured['collisions']=results['collisions']
+	measured['checksum']=Checksum(results['collisions'])
+	return measured
+
+def MakeMatrix(couples,musicfiles,mixes,tracetypes,seed=12345,tend=30.0,render=False):
+	""" Creates all cases of the benchmark matrix, all cases use the same seed,
+	so a case gives the same collisions in any matrix
+	"""
+	cases=list()
+	for n,musicfile,mix,tracetype in itertools.product(couples,musicfiles,mixes,tracetypes):
+		if render==False and tracetype>0:
+			continue #traces are not drawn without rendering
+		cases.append({'couples':n,'musicfile':musicfile,'mix':mix,'tracetype':tracetype,'seed':seed,'tend':tend,'render':render})
+	return cases
+
+def RunBenchmark(cases,outputfilename=None):
+	""" Runs every case in a new python process
+
+	Input:
+	cases (list(dict)) see MakeMatrix
+	outputfilename (str) JSON file the results are saved to, None to skip saving
+
+	Output:
+	benchmark (dict) information about the machine and the results of all cases
+	"""
+	benchmark={'created':time.strftime('%Y-%m-%d %H:%M:%S'),'python':sys.version.split()[0],'platform':platform.platform(),'commit':Commit(),'cases':list()}
+	for case in cases:
+		process=subprocess.run([sys.executable,__file__,'--case',json.dumps(case)],stdout=subprocess.PIPE,stderr=subprocess.PIPE,universal_newlines=True)
+		lines=[x for x in process.stdout.splitlines() if x.startswith(PREFIX)]
+		if len(lines)==0:
+			measured=dict(case)
+			measured['error']=(process.stderr.strip().splitlines() or ['exit code '+str(process.returncode)])[-1]
+		else:
+			measured=json.loads(lines[-1][len(PREFIX):])
+		benchmark['cases'].append(measured)
+		print(Row(measured))
+		if outputfilename is not None: #save after every case, so an interrupted benchmark keeps its results
+			with open(outputfilename,'w') as f:
+				json.dump(benchmark,f,indent=1,sort_keys=True)
+	return benchmark
+
+def Commit():
+	""" Current git commit of the simulation, None if unknown
+	"""
+	try:
+		return subprocess.run(['git','rev-parse','--short','HEAD'],stdout=subprocess.PIPE,stderr=subprocess.DEVNULL,universal_newlines=True).stdout.strip() or None
+	except OSError:
+		return None
+
+def Key(case):
+	return (case['couples'],case['musicfile'],case['mix'],case['tracetype'],case['seed'],case['tend'],case['render'])
+
+def Name(measured):
+	couples=measured.get('simulatedcouples',measured['couples'])
+	return '%5d %-24s %-8s trace %d'%(couples,measured['musicfile'],measured['mix'],measured['tracetype'])
+
+def Row(measured):
+	name=Name(measured)
+	if 'error' in measured:
+		return name+'  error: '+measured['error']
+	return name+'  setup %7.3f s  %8.1f frames/s  %7.2f beats/s  peak %7.1f MB  checksum %s'%(measured['setup'],
+		measured['framespersecond'],measured['beatspersecond'],measured['peakrss']/2**20,measured['checksum'])
+
+def Compare(benchmark,referencefilename):
+	""" Prints the speed-up of every case against a reference benchmark
+	and whether the collisions are still the same
+	"""
+	with open(referencefilename) as f:
+		reference={Key(x):x for x in json.load(f)['cases']}
+	for measured in benchmark['cases']:
+		old=reference.get(Key(measured))
+		if old is None or 'error' in old or 'error' in measured:
+			continue
+		print(Name(measured)+'  frames/s x%5.2f  setup x%5.2f  peak memory x%5.2f  collisions %s'%(
+			measured['framespersecond']/old['framespersecond'],old['setup']/measured['setup'],
+			measured['peakrss']/old['peakrss'],'same' if measured['checksum']==old['checksum'] else 'CHANGED'))
+
+if __name__=='__main__':
+	parser=argparse.ArgumentParser(description='Benchmark the dance simulation on a fixed matrix of scenarios')
+	parser.add_argument('--couples',type=int,nargs='+',default=[10,30,100,300,1000])
+	parser.add_argument('--music',nargs='+',default=MUSICFILES)
+	parser.add_argument('--mixes',nargs='+',default=list(MIXES.keys()),choices=list(MIXES.keys()))
+	parser.add_argument('--tracetypes',type=int,nargs='+',default=[0,1,2])
+	parser.add_argument('--seed',type=int,default=12345)
+	parser.add_argument('--tend',type=float,default=30.0,help='simulated time per case (s)')
+	parser.add_argument('--render',action='store_true',help='render off-screen (needed for trace types 1 and 2)')
+	parser.add_argument('--output',default='Results/Benchmark.json')
+	parser.add_argument('--compare',default=None,help='benchmark file to compare the results with')
+	parser.add_argument('--case',default=None,help=argparse.SUPPRESS) #used internally to run one case
+	args=parser.parse_args()
+
+	if args.case is not None:
+		print(PREFIX+json.dumps(RunCase(json.loads(args.case))))
+	else:
+		cases=MakeMatrix(args.couples,args.music,args.mixes,args.tracetypes,args.seed,args.tend,args.render)
+		benchmark=RunBenchmark(cases,args.output)
+		if args.compare is not None:
+			Compare(benchmark,args.compare)
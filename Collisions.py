@@ -0,0 +1,108 @@
+import math
+
+import numpy as np
+
+VECTORISEFROM=64 #number of couples from which CollisionGrid.CandidatePairsArray uses numpy
+
+class CollisionGrid():
+	""" Uniform grid (spatial hash) over the ballroom floor.
+	Couples are sorted into square cells with the edge length of the largest
+	possible contact distance, so that only couples in the same or in neighbouring
+	cells can touch each other. This replaces the test of every couple against
+	every other couple by a test of the few couples that are actually close.
+	"""
+
+	def __init__(self,cellsize):
+		""" Input:
+		cellsize (float) edge length of a cell, i.e. the largest centre distance of two couples that can still be in contact
+		"""
+		self.cellsize=cellsize
+		#visiting only half of the neighbourhood guarantees that every unordered pair of cells is looked at once
+		self.neighbours=[(1,-1),(1,0),(1,1),(0,1)]
+
+	def Cell(self,x,y):
+		return (int(math.floor(x/self.cellsize)),int(math.floor(y/self.cellsize)))
+
+	def CandidatePairs(self,positions):
+		""" Finds all unordered pairs of couples that are close enough to touch
+
+		Input:
+		positions (list((float,float))) x/y coordinates of the centres of the couples
+
+		Output:
+		pairs (list((int,int))) list of index pairs (i,j) with i<j, every pair is contained only once
+		"""
+		cells=dict()
+		for index,(x,y) in enumerate(positions):
+			key=self.Cell(x,y)
+			try:
+				cells[key].append(index)
+			except KeyError:
+				cells[key]=[index]
+
+		maxdistance=self.cellsize**2
+		pairs=list()
+		for (cx,cy),members in cells.items():
+			candidates=[(members[a],members[b]) for a in range(len(members)) for b in range(a+1,len(members))]
+			for dx,dy in self.neighbours:
+				others=cells.get((cx+dx,cy+dy))
+				if others is not None:
+					candidates+=[(i,j) for i in members for j in others]
+			for i,j in candidates:
+				xi,yi=positions[i]
+				xj,yj=positions[j]
+				if (xi-xj)**2+(yi-yj)**2<=maxdistance:
+					pairs.append((i,j) if i<j else (j,i))
+		return pairs
+
+	def CandidatePairsArray(self,positions,groups=None):
+		""" Same as CandidatePairs, computed with numpy for all couples at once (the order of the pairs differs).
+		The overhead of numpy only pays off for many couples, for less than VECTORISEFROM couples CandidatePairs is used.
+
+		Input:
+		positions (numpy.array Nx2) x/y coordinates of the centres of the couples
+		groups (numpy.array int) group of every couple (e.g. the ballroom), only couples of the same group are paired, None for one group
+
+		Output:
+		first,second (numpy.array int) indices of the pairs, first<second, every pair is contained only once
+		"""
+		n=len(positions)
+		if n<2:
+			return np.zeros(0,dtype=np.int64),np.zeros(0,dtype=np.int64)
+		if n<VECTORISEFROM:
+			if groups is not None: #move the groups apart, so that couples of different groups are never close
+				span=positions[:,0].max()-positions[:,0].min()+2*self.cellsize
+				positions=positions+np.stack([np.asarray(groups)*span,np.zeros(n)],axis=1)
+			pairs=np.array(self.CandidatePairs(positions.tolist()),dtype=np.int64).reshape(-1,2)
+			return pairs[:,0],pairs[:,1]
+		cells=np.floor(positions/self.cellsize).astype(np.int64)
+		cells-=cells.min(axis=0)-1 #a free row and column around all cells, so neighbours of different cells never share a key
+		height=cells[:,1].max()+2
+		width=cells[:,0].max()+2
+		keys=cells[:,0]*height+cells[:,1]
+		if groups is not None:
+			keys+=np.asarray(groups,dtype=np.int64)*(width*height)
+		order=np.argsort(keys,kind='stable')
+		sortedkeys=keys[order]
+
+		first=list()
+		second=list()
+		for dx,dy in [(0,0)]+self.neighbours:
+			start=np.searchsorted(sortedkeys,keys+dx*height+dy,'left')
+			end=np.searchsorted(sortedkeys,keys+dx*height+dy,'right')
+			counts=end-start
+			i=np.repeat(np.arange(n),counts)
+			j=order[np.repeat(start-np.cumsum(counts)+counts,counts)+np.arange(counts.sum())]
+			if dx==0 and dy==0:
+				keep=i<j #couples of the same cell, every pair once
+				i=i[keep]
+				j=j[keep]
+			first.append(i)
+			second.append(j)
+		i=np.concatenate(first)
+		j=np.concatenate(second)
+		d=positions[i]-positions[j]
+		close=d[:,0]**2+d[:,1]**2<=self.cellsize**2
+		i=i[close]
+		j=j[close]
+		return np.minimum(i,j),np.maximum(i,j)
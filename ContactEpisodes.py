@@ -0,0 +1,113 @@
+""" Contacts between couples as episodes instead of per-frame sums.
+
+An episode of a pair of couples begins in the first time-step in which bullet holds contact points
+between the two bodies and ends in the first time-step without contact points. The contacts are
+taken from the persistent manifolds of bullet (BulletWorld.getManifolds), which bullet keeps up to
+date anyway, so no pair has to be tested by the simulation. Only the pairs whose contact state
+changed are processed: the impact speed is measured when an episode begins, the duration when it ends.
+
+Per group of couples (the identifier, see DanceClass.Simulation.COLLISIONGROUPS):
+	episodes - number of episodes per couple (every episode counts for both couples)
+	duration - time in contact per couple (s)
+	impactspeed - mean relative speed of the bodies along the contact normal when the episodes began (m/s)
+The number of episodes and their durations do not depend on the length of the time-step
+(as long as the time-step resolves the contacts), unlike the sum of contact points per frame.
+"""
+
+class ContactEpisodes():
+	""" Tracks the contact episodes of all couples (see above)
+	"""
+
+	def __init__(self,names,groups):
+		""" Input:
+		names (list(str)) names of the bodies of the couples (bodies with other names, e.g. the floor, are ignored)
+		groups (list) group of every couple
+		"""
+		self.index={name:i for i,name in enumerate(names)} #body name -> index of the couple
+		self.groups=groups
+		self.active=dict() # (i,j) -> time the episode began
+		self.episodes={x:0 for x in set(groups)}
+		self.duration={x:0.0 for x in set(groups)}
+		self.impactspeed={x:0.0 for x in set(groups)} #sum over the episodes
+
+	def Touching(self,worlds):
+		""" Finds all pairs of couples that are in contact
+
+		Input:
+		worlds (list(BulletWorld)) the worlds of the couples
+
+		Output:
+		touching (dict) (i,j) with i<j -> manifold of the pair
+		"""
+		touching=dict()
+		index=self.index
+		for world in worlds:
+			for manifold in world.getManifolds():
+				if manifold.getNumManifoldPoints()==0:
+					continue
+				i=index.get(manifold.getNode0().getName())
+				j=index.get(manifold.getNode1().getName())
+				if i is None or j is None:
+					continue
+				touching[(i,j) if i<j else (j,i)]=manifold
+		return touching
+
+	def Update(self,touching,time,impactspeed):
+		""" Starts and ends the episodes of the current time-step
+
+		Input:
+		touching (dict) pairs in contact, see Touching
+		time (float) simulation time at the end of the time-step
+		impactspeed (function) called with (i,j,manifold) for every new episode, returns the impact speed
+
+		Output:
+		begun (list((int,int))) pairs whose episode began in this time-step
+		"""
+		begun=[pair for pair in touching if pair not in self.active]
+		ended=[pair for pair in self.active if pair not in touching]
+		for pair in ended:
+			self.End(pair,time)
+		for i,j in begun:
+			self.active[(i,j)]=time
+			speed=impactspeed(i,j,touching[(i,j)])
+			for k in (i,j):
+				self.episodes[self.groups[k]]+=1
+				self.impactspeed[self.groups[k]]+=speed
+		return begun
+
+	def End(self,pair,time):
+		start=self.active.pop(pair)
+		for k in pair:
+			self.duration[self.groups[k]]+=time-start
+
+	def Finish(self,time):
+		""" Ends all episodes that are still active at the end of the simulation
+		"""
+		for pair in list(self.active.keys()):
+			self.End(pair,time)
+
+	def Results(self,counts):
+		""" Input:
+		counts (dict) number of couples per group
+
+		Output:
+		(dict) group -> {'episodes','duration','impactspeed'} (see above)
+		"""
+		results=dict()
+		for group,n in counts.items():
+			episodes=self.episodes.get(group,0)
+			results[group]={'episodes':episodes/n,'duration':self.duration.get(group,0.0)/n,
+				'impactspeed':self.impactspeed.get(group,0.0)/episodes if episodes>0 else 0.0}
+		return results
+
+	def State(self):
+		""" Output:
+		(dict) state of the episodes (see DanceClass.Simulation.SaveCheckpoint)
+		"""
+		return {'active':dict(self.active),'episodes':dict(self.episodes),'duration':dict(self.duration),'impactspeed':dict(self.impactspeed)}
+
+	def Restore(self,state):
+		self.active=dict(state['active'])
+		self.episodes.update(state['episodes'])
+		self.duration.update(state['duration'])
+		self.impactspeed.update(state['impactspeed'])
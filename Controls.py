@@ -1,5 +1,6 @@
 from panda3d.core import *
 import math
+import os
 
 class Controls():
 	""" Class that initilaises the keyboards which are available for use while the simulation is running
@@ -44,6 +45,7 @@ class Controls():
 		
 		self.Sim.accept('p',self.KeyPause)
 		self.Sim.accept('o',self.KeyScreenshot)
+		self.Sim.accept('l',self.KeyQuality)
 		
 		return self.Sim
 	
@@ -172,6 +174,12 @@ class Controls():
 			base.taskMgr.add(self.task,'update')
 			self.paused=False
 		
+	def KeyQuality(self):
+		""" Switch the level of detail of the couples between automatic, high and low (see RenderQuality)
+		"""
+		if self.Sim.Quality is not None:
+			print('level of detail: '+self.Sim.Quality.NextMode())
+		
 	def KeyScreenshot(self):
 		L=os.listdir('Images')
 		name='Screenshot'
@@ -0,0 +1,211 @@
+import numpy as np
+
+from RunningMedian import RunningMedian
+import TraceFile
+
+class CoupleTable():
+	""" State of all dance couples, stored column-wise (one array per property)
+	instead of one dict per couple.
+
+	Numerical properties and the spinning state are NumPy arrays with one entry per couple,
+	traces and spin histories are preallocated 2D/3D arrays (beats x couples).
+	Objects that cannot be stored in arrays (panda nodes, median estimators) are kept in lists.
+	A single couple can be accessed as a Couple view (see Couple).
+	"""
+
+	STATE=['pairdistance','randomoffset','energy','leftspin','white','angles','energies','beatlengths'] #arrays that change during a simulation
+
+	def __init__(self,PAIRINFOS,nbeats,historylength=None,factorwindow=None):
+		""" Input:
+		PAIRINFOS (list(dict)) specification of the couples (see DanceClass.Simulation)
+		nbeats (int) maximum number of trace points per couple (the initial position plus one per spin)
+		historylength (int) number of recent spins whose angle, energy and beat length are stored, None to store all
+		factorwindow (int) number of recent spins used for the median of the energy factor, None to use all spins
+		"""
+		N=len(PAIRINFOS)
+		self.size=N
+
+		#static properties
+		self.maxenergy=np.array([x['maxenergy'] for x in PAIRINFOS],dtype=float)
+		self.initialenergy=np.array([x['initialenergy'] for x in PAIRINFOS],dtype=float)
+		self.leftdancer=np.array([x['leftdancer'] for x in PAIRINFOS],dtype=bool)
+		self.mass=np.array([x['mass'] for x in PAIRINFOS],dtype=float)
+		self.identifier=[x['identifier'] for x in PAIRINFOS]
+		self.modelname=[x['modelname'] for x in PAIRINFOS]
+		self.pairdistance=np.zeros(N) #measured distance between the rotation axes, set in MakePair
+		self.randomoffset=np.zeros(N) #if necessary, couples can be manipulated with random skill properties
+
+		#spinning state
+		self.energy=np.zeros(N) #current spin-energy
+		self.leftspin=np.zeros(N,dtype=bool) #current spinning direction, all couples start spinning right
+		self.white=np.ones(N,dtype=np.int8) #which of the two is the follwing (white) partner
+
+		#traces, positions of the rotation axes (x,y) at every spin, panda positions are single precision anyway
+		self.trace=np.full((nbeats,N,2),np.nan,dtype=np.float32)
+		self.tracelength=0
+
+		#spin history, a ring buffer if the history length is bounded
+		#(only kept for analysis, the energy factors are estimated from the full precision values)
+		if historylength is None:
+			historylength=nbeats
+		self.historylength=historylength
+		self.historycount=0
+		self.angles=np.zeros((historylength,N),dtype=np.float32) #danced angles
+		self.energies=np.zeros((historylength,N),dtype=np.float32) #applied energies
+		self.beatlengths=np.zeros(historylength,dtype=np.int32) #beat lengths (the same for all couples)
+
+		#objects
+		self.physicsnode=[None]*N
+		self.pandanode=[None]*N
+		self.factors=[RunningMedian(factorwindow) for x in range(N)] #estimators for the energy factor
+
+	def __len__(self):
+		return self.size
+
+	def __getitem__(self,index):
+		return Couple(self,index)
+
+	def __iter__(self):
+		for index in range(self.size):
+			yield Couple(self,index)
+
+	def StreamTrace(self,filename):
+		""" Moves the traces into a trace file (see TraceFile), every following
+		spin is written into the file immediately
+		
+		Input:
+		filename (str) .npy trace file
+		"""
+		trace=TraceFile.CreateTraceFile(filename,self.trace.shape[0],self.size)
+		trace[:self.tracelength]=self.trace[:self.tracelength]
+		self.trace=trace
+		self.tracefilename=filename
+		self.FlushTrace()
+
+	def FlushTrace(self):
+		""" Writes the traces and their length into the trace file (if the traces are streamed)
+		"""
+		if isinstance(self.trace,np.memmap):
+			self.trace.flush()
+			TraceFile.WriteLength(self.tracefilename,self.tracelength)
+
+	def AppendTrace(self,positions):
+		""" Input:
+		positions (numpy.array Nx2) current positions of the rotation axes
+		"""
+		self.trace[self.tracelength]=positions
+		self.tracelength+=1
+		self.FlushTrace()
+
+	def Traces(self):
+		""" Output:
+		(numpy.array beats x N x 2) traces of all couples so far
+		"""
+		return self.trace[:self.tracelength]
+
+	def State(self):
+		""" Output:
+		state (dict) all properties of the couples that change during a simulation (see Restore)
+		"""
+		state={name:np.array(getattr(self,name)) for name in self.STATE}
+		state['trace']=np.array(self.Traces())
+		state['historycount']=self.historycount
+		state['factors']=self.factors
+		return state
+
+	def Restore(self,state):
+		""" Sets all properties of the couples that change during a simulation,
+		the static properties (from PAIRINFOS) are kept
+
+		Input:
+		state (dict) see State
+		"""
+		if len(state['energy'])!=self.size:
+			raise ValueError('the state contains '+str(len(state['energy']))+' couples, the table '+str(self.size))
+		for name in self.STATE:
+			getattr(self,name)[:]=state[name]
+		self.tracelength=len(state['trace'])
+		self.trace[:]=np.nan
+		self.trace[:self.tracelength]=state['trace']
+		self.FlushTrace()
+		self.historycount=state['historycount']
+		self.factors=list(state['factors'])
+
+	def AppendHistory(self,angles,energies,beatlength):
+		""" Stores the observed angles and applied energies of the last spin
+
+		Input:
+		angles (numpy.array N) danced angles
+		energies (numpy.array N) applied energies
+		beatlength (int) length of the beat (frames)
+		"""
+		row=self.historycount%self.historylength
+		self.angles[row]=angles
+		self.energies[row]=energies
+		self.beatlengths[row]=beatlength
+		self.historycount+=1
+
+	def History(self,array,count=None):
+		""" Returns a history buffer in chronological order
+
+		Input:
+		array (numpy.array) one of angles, energies, beatlengths
+		count (int) number of most recent entries, None for all stored entries
+
+		Output:
+		(numpy.array) the entries, oldest first
+		"""
+		stored=min(self.historycount,self.historylength)
+		if count is None or count>stored:
+			count=stored
+		rows=[(self.historycount-count+k)%self.historylength for k in range(count)]
+		return array[rows]
+
+def _Column(name):
+	""" Property of a Couple view that reads/writes the entry of the couple in a column of the table
+	"""
+	def Get(self):
+		return getattr(self.table,name)[self.index]
+	def Set(self,value):
+		getattr(self.table,name)[self.index]=value
+	return property(Get,Set)
+
+class Couple():
+	""" Light-weight view on one couple of a CoupleTable
+	"""
+	__slots__=('table','index')
+
+	def __init__(self,table,index):
+		self.table=table
+		self.index=index
+
+	maxenergy=_Column('maxenergy')
+	initialenergy=_Column('initialenergy')
+	leftdancer=_Column('leftdancer')
+	mass=_Column('mass')
+	identifier=_Column('identifier')
+	modelname=_Column('modelname')
+	pairdistance=_Column('pairdistance')
+	randomoffset=_Column('randomoffset')
+	energy=_Column('energy')
+	leftspin=_Column('leftspin')
+	white=_Column('white')
+	physicsnode=_Column('physicsnode')
+	pandanode=_Column('pandanode')
+	factors=_Column('factors')
+
+	@property
+	def trace(self):
+		return self.table.trace[:self.table.tracelength,self.index]
+
+	@property
+	def angles(self):
+		return self.table.History(self.table.angles)[:,self.index]
+
+	@property
+	def energies(self):
+		return self.table.History(self.table.energies)[:,self.index]
+
+	@property
+	def beatlengths(self):
+		return self.table.History(self.table.beatlengths)
@@ -19,13 +19,37 @@ from panda3d.bullet import *
 #additional libraries necesary
 import random
 import math
+import os
+import gzip
+import pickle
+import time
 import statistics
+from collections import deque
+import numpy as np
 
 
 #save traces of pairs
-import json
+import TraceFile
+from Results import ResultStore
 
 from Controls import Controls
+from Collisions import CollisionGrid
+from BeatScheduler import BeatScheduler
+from BeatLibrary import BeatTrack
+from CoupleTable import CoupleTable
+from MovieRecorder import MovieRecorder
+from TraceRenderer import TraceRenderer
+from Placement import Placement
+from ModelLibrary import ModelLibrary
+from Profiler import Profiler,NullProfiler
+from GuidanceField import MakeField
+from ContactEpisodes import ContactEpisodes
+from RenderQuality import RenderQuality
+from Telemetry import Telemetry
+
+#collision masks of the bodies, two bodies can only collide if their masks share a bit
+COUPLEMASK=BitMask32.bit(0)
+FLOORMASK=BitMask32.bit(1)
 
 
 # with pairdistance of 2.5 and velocity of 12.014 we reach about 180 degree with beat-length 40
@@ -35,61 +59,142 @@ class Simulation(ShowBase):
 	"""
 	
 	################################################################################# COONSTRUCTOR #######################################################
-	def __init__(self,PAIRS,BEATS,tend=None,movie=False,renderType=True,tracetype=0):
+	def __init__(self,PAIRS,BEATS,tend=None,movie=False,renderType=True,tracetype=0,beatspacing=1,beatpolicy='merge',factorwindow=None,historylength=None,movieresolution=(6400,3600),movieformat='png',tracethickness=2.0,tracedecimation=1,tracemaxvertices=None,placement='borders',modelcache=True,physicsrate=None,renderevery=1,profile=None,ballroomsize=(40.0,20.0),guidancefield='ellipsesq',guidancegrid=None,planar=False,collisionmode='frames',lod=None,framebudget=None,flattenfloor=False,telemetry=None):
 		""" When initialising a new Simulation class a new
 		bullet physics environment is created. 
 		
 		Input:
 		PAIRS (list(dict)) list of dict objects that specify the pairs which will be created by the simulation
 		BEATS (list(float)) list of seconds corrsponding to every first beat of the 3/4 times waltz music
+					or a BeatLibrary.BeatTrack, whose frames of the beats are computed only once per process
 		TEND (float) endtime of the simulation (seconds)
 					can be None in order to make the sim stop at the last beat of the loaded music
 		movie (bool) if True, the engine will render an image of the simulation per frame into the Images folder
 		renderType (bool) if True, the 3D engine will render the current status of the simulation
+					if False (and no movie is made), the simulation runs as a pure physics engine: no window, no
+					task manager, no lights, textures or 3D models are created at all
 		tracetype (int) 0 - no trace is drawn
 						1 - the trace is drawn every beat (draws the direct path of the couple)
 						2 - the trace is drawn every frame (draws all swirls of every couple)
+		beatspacing (int) minimum number of frames between two beats
+		beatpolicy (str) how beats closer than beatspacing are handled, 'merge' (drop the later beat) or 'shift' (delay it), see BeatScheduler
+		factorwindow (int) number of recent spins used to estimate the energy factor of a couple (see EnergyFactor), None to use all spins
+		historylength (int) number of recent spins whose angle, energy and beat length are stored per couple, None to store all
+		movieresolution ((int,int)) width and height of the movie images
+		movieformat (str) 'png' or 'raw' (see MovieRecorder)
+		tracethickness (float) line width of the traces
+		tracedecimation (int) only every tracedecimation-th position is added to the traces
+		tracemaxvertices (int) maximum number of positions per trace line, older positions disappear, None for no limit
+		placement (str) initial distribution of the couples, 'borders', 'uniform' or 'poisson' (see Placement)
+		modelcache (bool) if True, the couple models are cached as .bam files next to the .egg files (see ModelLibrary)
+		physicsrate (float) number of physics sub-steps per second of simulation time, must be a multiple of 1/dt (40 Hz),
+					e.g. 400 for ten sub-steps per time-step. None for the behaviour of earlier versions: bullet
+					advances one sub-step of 1/60 s per time-step
+		renderevery (int) only every renderevery-th time-step is rendered (and saved as image of the movie),
+					the simulation runs faster than real time if renderevery>1
+		profile (bool or str) if True, the time spent in the phases of every time-step is measured and a summary
+					is printed at the end (see Profiler), if a filename is given, the statistics are also saved as JSON
+		ballroomsize ((float,float)) length and width of the dance floor (m)
+		guidancefield (str or callable) vector field the couples try to follow, 'ellipsesq', 'square' or a field (see GuidanceField)
+		guidancegrid (float) if given, the field is sampled once on a grid with this resolution (m) and interpolated
+		planar (bool) if True, the couples only move in the plane of the floor (no gravity, no floor contacts,
+					only couple-couple pairs in the broadphase, see ConfigureBody), faster on large floors.
+					if False, the couples stand on the floor under gravity as in earlier versions
+		collisionmode (str) how the collisions are counted: 'frames' - contact points of every frame, summed up (earlier versions),
+					'episodes' - number of contact episodes (see ContactEpisodes), does not depend on the time-step,
+					'both' - the collisions of 'frames' and additionally the episodes
+		lod ((float,float)) if given, the couples are drawn as full models up to the first distance (m) from the camera,
+					as boxes up to the second distance and as billboards beyond (see RenderQuality)
+		framebudget (float) if given, the level of detail is lowered automatically while the frames take longer
+					than this time (s), e.g. 1/30.0 (only if the simulation is shown, not for movies)
+		flattenfloor (bool) if True, the model of the floor is flattened into one static geom
+		telemetry (str) if given, a summary of every beat is sent to this target while the simulation runs,
+					'udp:PORT' or a file name (see Telemetry)
 		"""
 		
-		ShowBase.__init__(self)
+		setupstart=time.perf_counter()
+		self.movie=movie
+		self.renderType=renderType
+		self.headless=(self.renderType==False and self.movie==False) #nothing will ever be shown, skip all graphics
+		
+		if self.headless==True:
+			self.render=NodePath('render') #plain scene graph root, only carrying the physics nodes
+		else:
+			ShowBase.__init__(self)
+			if self.renderType==False:
+				self.HideRender()
 		
 		self.PAIRINFOS=PAIRS
 		self.PAIRNUMBER=len(PAIRS)
 		
 		self.dt = 0.025 #length of a time-step
+		#the clock counts time-steps (integer), the time is always derived from the number of time-steps
+		if physicsrate is None:
+			self.substeps=None
+		else:
+			self.substeps=int(round(physicsrate*self.dt))
+			if self.substeps<1 or abs(self.substeps-physicsrate*self.dt)>1e-9:
+				raise ValueError('physicsrate must be a multiple of '+str(1/self.dt)+' Hz')
+		self.renderevery=renderevery
+		if profile is None or profile is False:
+			self.Profiler=NullProfiler()
+		else:
+			self.Profiler=Profiler(None if profile is True else profile)
+		frames=None
+		if isinstance(BEATS,BeatTrack):
+			frames=BEATS.Frames(self.dt).tolist()
+			BEATS=BEATS.Beats()
 		self.BEATS=BEATS
-		self.BEATFRAMES=[int(x/self.dt) for x in self.BEATS]
+		self.BEATSCHEDULER=BeatScheduler(self.BEATS,self.dt,beatspacing,beatpolicy,frames)
+		self.BEATFRAMES=self.BEATSCHEDULER.BEATFRAMES
+		if len(self.BEATSCHEDULER.DROPPED)+len(self.BEATSCHEDULER.SHIFTED)>0:
+			print('Beats closer than '+str(beatspacing)+' frame(s): '+str(len(self.BEATSCHEDULER.DROPPED))+' merged, '+str(len(self.BEATSCHEDULER.SHIFTED))+' shifted')
 		
 		if tend==None:
 			self.TEND=BEATS[-1]
 		else:
 			self.TEND=tend
+		self.ENDFRAME=int(math.ceil(round(self.TEND/self.dt,9))) #the simulation stops after this time-step
 		#print(self.BEATS)
 		
 		self.tracetype=tracetype
-		
-		self.movie=movie
-		self.renderType=renderType
-		if self.renderType==False:
-			self.render.hide()
+		if self.headless==True:
+			self.tracetype=0 #traces are only drawn, never stored, so they are of no use without rendering
 		
 		self.SCENARIO='Ballroom'
-		self.disableMouse() #only use keybord to navigate the camera!
-		self.setAspectRatio(16.0/9.0) #image ratio to make a nice movie
 		
-		self.world = BulletWorld()
-		self.world.setGravity(Vec3(0, 0, -9.81))
-		self.setBackgroundColor(0,0,0.2,1) #very dark blue background
+		self.planar=planar
+		self.world = self.MakeWorld()
+		self.Worlds=[self.world] #bullet worlds of all ballrooms (see BatchSimulation)
 		
 		#initialise some defaults
+		self.factorwindow=factorwindow
+		self.historylength=historylength
+		if self.historylength is not None:
+			self.historylength=max(self.historylength,3) #the beat length estimate needs the last three beats
 		self.defaultangle=70.0  #default angle that couples aim to dance, if they dont know any better
 		self.bodyradius=0.5 #size of one dancer
-		
-		#some default textures that are applied later to some elements (arrows, boxes etc)
-		self.texwhite=self.loader.loadTexture('Sources/tex/white.png')
-		self.texblack=self.loader.loadTexture('Sources/tex/black.png')
-		self.texgrey=self.loader.loadTexture('Sources/tex/grey.png')
-		self.texred=self.loader.loadTexture('Sources/tex/red.png')
+		self.placement=placement
+		self.flattenfloor=flattenfloor
+		self.Quality=None #level of detail of the couple models (see RenderQuality)
+		self.Telemetry=None if telemetry is None else Telemetry(telemetry) #live summaries of the beats
+		if collisionmode not in ('frames','episodes','both'):
+			raise ValueError('unknown collisionmode: '+str(collisionmode))
+		self.collisionmode=collisionmode
+		
+		if self.headless==False:
+			self.disableMouse() #only use keybord to navigate the camera!
+			self.setAspectRatio(16.0/9.0) #image ratio to make a nice movie
+			self.setBackgroundColor(0,0,0.2,1) #very dark blue background
+			
+			#some default textures that are applied later to some elements (arrows, boxes etc)
+			self.texwhite=self.loader.loadTexture('Sources/tex/white.png')
+			self.texblack=self.loader.loadTexture('Sources/tex/black.png')
+			self.texgrey=self.loader.loadTexture('Sources/tex/grey.png')
+			self.texred=self.loader.loadTexture('Sources/tex/red.png')
+			if lod is not None or framebudget is not None:
+				self.Quality=RenderQuality(lod or (15.0,40.0),framebudget if self.movie==False else None)
+			self.Models=ModelLibrary(self.loader,'Sources',modelcache,self.Quality) #one shared prototype per couple model
 		
 		#reset some numbers
 		self.time = 0 # simulation time [s]
@@ -98,19 +203,33 @@ class Simulation(ShowBase):
 		self.spinnumber=0 # it is the first spin
 		self.imagenumber=0 # it creates the first image
 		self.currentbeatlength=0 # length of the beat
+		self.finished=False # becomes True once finalStuff has saved the results
+		self.RESULTS=None # results of the simulation, filled by finalStuff
+		self.SCENARIONAME=None # output settings, see Run
+		self.RESULTFILENAME=None
+		self.TRACEFILENAME=None
+		self.JSONFILENAME=None
+		self.CHECKPOINTFILENAME=None
 		
-		self.Keys=Controls() #initialise keyboard keys to turn, zoom etc.
-		self.Keys.MakeKeys(self)
+		if self.headless==False:
+			self.Keys=Controls() #initialise keyboard keys to turn, zoom etc.
+			self.Keys.MakeKeys(self)
 		
-		self.ballroomsize=[40.0,20.0]
+		self.ballroomsize=list(ballroomsize)
+		self.GuidanceField=MakeField(guidancefield,self.ballroomsize,guidancegrid) #target directions of the couples
 		
 		self.MakeFloor() #create the ballroom floor
 		self.InitialisePairsRandom()
-		self.InitialiseLight()
-		self.InitialiseCam()
+		if self.headless==False:
+			self.InitialiseLight()
+			self.InitialiseCam()
+		if self.tracetype>0:
+			self.Traces=TraceRenderer(self.render,self.PAIRNUMBER,tracethickness,tracedecimation,tracemaxvertices) #lines on the floor
+		if self.movie==True:
+			self.Movie=MovieRecorder(self,movieresolution[0],movieresolution[1],movieformat) #off-screen buffer for the images of the movie
 		
 		debugging=False
-		if debugging==True:
+		if debugging==True and self.headless==False:
 			debugNode = BulletDebugNode('Debug') 
 			debugNode.showWireframe(True)
 			debugNode.showConstraints(False)
@@ -120,8 +239,36 @@ class Simulation(ShowBase):
 			self.world.setDebugNode(debugNP.node())
 			debugNP.show()
 		
+		self.setuptime=time.perf_counter()-setupstart
 		
 	################################################################################# INITIALISATION ROUTINES ##################################################	
+	def MakeWorld(self):
+		""" Creates an empty bullet world (with gravity unless the motion is planar)
+		"""
+		world=BulletWorld()
+		if self.planar==False:
+			world.setGravity(Vec3(0, 0, -9.81))
+		return world
+	
+	def ConfigureBody(self,physicsnode,kind):
+		""" Sets the collision mask and the motion constraints of a body.
+		In planar mode, the floor does not collide with anything, so the broadphase only pairs couples,
+		and the couples can only move along the floor and turn around the vertical axis.
+		Without planar mode, the defaults of bullet are kept (all bodies collide, no constraints).
+		
+		Input:
+		physicsnode (BulletRigidBodyNode) the body, before it is attached to the world
+		kind (str) 'floor' or 'couple'
+		"""
+		if self.planar==False:
+			return
+		if kind=='floor':
+			physicsnode.setIntoCollideMask(FLOORMASK)
+		else:
+			physicsnode.setIntoCollideMask(COUPLEMASK)
+			physicsnode.setLinearFactor(Vec3(1,1,0)) #no movement in z
+			physicsnode.setAngularFactor(Vec3(0,0,1)) #no roll and pitch
+	
 	def MakeFloor(self):
 		""" Create the floor as a rigid physical object and as a 3D visualisation
 		"""
@@ -131,17 +278,21 @@ class Simulation(ShowBase):
 		physicsnode=BulletRigidBodyNode(name)
 		physicsnode.addShape(shape)
 		physicsnode.setMass(0)
+		self.ConfigureBody(physicsnode,'floor')
 		self.world.attachRigidBody(physicsnode)
 		#pandanode
 		nodepath=self.render.attachNewNode(physicsnode)
 		nodepath.setPos(0,0,0)
 		nodepath.setHpr(0,0,0)
-		model=self.loader.loadModel('Sources/parquet.egg')
-		#model=self.loader.loadModel('Sources/parquet_clean.egg')
-		model.setScale(Vec3(100,100,1))
-		model.setPos(0,0,0)
-		model.setShaderAuto()
-		model.reparentTo(nodepath)
+		if self.headless==False:
+			model=self.loader.loadModel('Sources/parquet.egg')
+			#model=self.loader.loadModel('Sources/parquet_clean.egg')
+			model.setScale(Vec3(100,100,1))
+			model.setPos(0,0,0)
+			model.setShaderAuto()
+			if self.flattenfloor==True:
+				model.flattenStrong() #the floor never moves
+			model.reparentTo(nodepath)
 		self.Floor=dict()
 		self.Floor['pandanode']=nodepath
 		self.Floor['physicsnode']=physicsnode
@@ -152,33 +303,48 @@ class Simulation(ShowBase):
 		Note, that the algorithm takes care that the couples
 		dont intersect (have enough space to "stand")!
 		"""
+		self.Couples=CoupleTable(self.PAIRINFOS,len(self.BEATFRAMES),self.historylength,self.factorwindow) #state of all couples
 		self.Pairs=[]
-		a=self.ballroomsize[0]/2
-		b=self.ballroomsize[1]/2
-		positions=list()
-		for index in range(self.PAIRNUMBER):
-			d1=self.PAIRINFOS[index]['pairdistance']
-			while True:
-				r=[random.random()**(0.5)*a*(random.choice([-1,1])),random.random()**(0.5)*b*(random.choice([-1,1]))] #random place with preference close to the borders
-				pos1=Point3(r[0],r[1],0)
-				angle=random.random()*360 #random angle
-				pos2=Point3(r[0]-math.sin(angle)*d1,r[1]+math.cos(angle)*d1,0)
-				accepted=True #accept position?
-				for p in positions:
-					if (p-pos1).length()<3*self.bodyradius: #Partner 1 has enough space?
-						accepted=False
-					if (p-pos2).length()<3*self.bodyradius: #Partner 2 has enough space?
-						accepted=False
-				if accepted==True:
-					pair=self.MakePair(pos1,pos2,index)
-					self.Pairs.append(pair)
-					break
+		positions=list() #positions of the leading partners
+		def Placed(p1,p2,index):
+			pos1=Point3(p1[0],p1[1],0)
+			pos2=Point3(p2[0],p2[1],0)
+			self.Pairs.append(self.MakePair(pos1,pos2,index))
 			positions.append(pos1)
-			positions.append(pos2)
+		self.PlaceCouples(Placed)
+		self.BALLROOM=[0]*self.PAIRNUMBER #ballroom (index in self.Worlds) of every couple
+		for k,couples in enumerate(self.BALLROOMSLICES):
+			self.BALLROOM[couples]=[k]*(couples.stop-couples.start)
+		
+		#the traces start at the position of the leading partners
+		self.Couples.AppendTrace([(p[0],p[1]) for p in positions])
+		self.recentpositions=deque([np.array([(p[0],p[1],p[2]) for p in positions]).reshape(-1,3)],maxlen=3) #last three positions of the rotation axes
 		
-		self.PAIRIDENTIFIERS=list(set([x['identifier'] for x in self.Pairs]))
+		#the contacts of the couples are averaged over the couples of the same group (identifier)
+		self.PAIRIDENTIFIERS=list(set(self.COLLISIONGROUPS))
 		self.PAIRIDENTIFIERS.sort()
 		self.TOTALCOLLISIONS={x:0 for x in self.PAIRIDENTIFIERS}
+		self.IDENTIFIERCOUNTS={x:self.COLLISIONGROUPS.count(x) for x in self.PAIRIDENTIFIERS}
+		self.Episodes=None
+		if self.collisionmode!='frames':
+			self.Episodes=ContactEpisodes([node.getName() for node in self.Couples.physicsnode],self.COLLISIONGROUPS)
+		
+		#two couples can only touch if the centres of their boxes are closer than the sum of the half-diagonals
+		#(plus some slack for the collision margin of bullet)
+		halfdiagonal=max([(x['pairdistance']**2+self.bodyradius**2)**0.5 for x in self.PAIRINFOS]+[0])
+		self.CollisionGrid=CollisionGrid(2*halfdiagonal+0.2)
+	
+	def PlaceCouples(self,Placed):
+		""" Distributes the couples on the floor (see Placement) and sets the
+		couples of every ballroom and the groups of the collision count
+		
+		Input:
+		Placed (function) creates a couple, called with (pos1,pos2,index) (see Placement.Place)
+		"""
+		placement=Placement(self.ballroomsize,3*self.bodyradius,self.placement) #every dancer needs enough space to "stand"
+		placement.Place([x['pairdistance'] for x in self.PAIRINFOS],Placed)
+		self.BALLROOMSLICES=[slice(0,self.PAIRNUMBER)] #couples of every world in self.Worlds
+		self.COLLISIONGROUPS=list(self.Couples.identifier) #group of every couple in TOTALCOLLISIONS
 	
 	def InitialiseCam(self):
 		""" Initialises the camera position
@@ -223,17 +389,13 @@ class Simulation(ShowBase):
 		index (int) index of the pair in the list 
 		
 		Output:
-		pair (dict) object that contains a lot of information about the dance couple (see last code lines in this routine)
+		pair (Couple) view on the entry of the dance couple in the CoupleTable self.Couples
 		"""
 		
 		#speficy initial parameters for the pair.
 		pairdistance = self.PAIRINFOS[index]['pairdistance']
-		initialenergy = self.PAIRINFOS[index]['initialenergy']
-		maxenergy = self.PAIRINFOS[index]['maxenergy']
 		modelname = self.PAIRINFOS[index]['modelname']
-		leftdancer = self.PAIRINFOS[index]['leftdancer']
 		mass = self.PAIRINFOS[index]['mass']
-		identifier = self.PAIRINFOS[index]['identifier']
 		
 		radius=self.bodyradius
 		height=1.7
@@ -249,6 +411,7 @@ class Simulation(ShowBase):
 		physicsnode.addShape(shape, TransformState.makePos(Vec3(pairdistance*0.5,0,height*0.5)))
 		physicsnode.setMass(mass) #note that one couple has one mass! Not each partner!
 		physicsnode.setFriction(0)
+		self.ConfigureBody(physicsnode,'couple')
 		self.world.attachRigidBody(physicsnode)
 		
 		nodepath=self.render.attachNewNode(physicsnode)
@@ -263,253 +426,148 @@ class Simulation(ShowBase):
 		dummyNode2.reparentTo(nodepath)
 		
 		#create the 3D model Object
-		modname='Sources/'+modelname
-		model = self.loader.loadModel(modname)
+		model = NodePath('model') #holder of the model, it is turned around in Change
+		if self.headless==False:
+			self.Models.Instance(modelname,model) #shared instance of the 3D model (see ModelLibrary)
 		model.setScale(radius*0.5,radius*0.5,radius*0.5)
 		model.setPos(pairdistance*0.5,0,0)
 		model.setHpr(180,0,0)
-		model.setShaderAuto()
 		model.reparentTo(nodepath)
 		
 		nodepath.setPos(pos1)
 		nodepath.setHpr(Point3(180-angle,0,0))
 		
 		
-		pair=dict() #each pair is saved as a dict object with different entries	
-		
-		#add information to the dict object 
-		pair['physicsnode']=physicsnode
-		pair['pandanode']=nodepath
-		pair['white']=1  #which of the two is the follwing (white) partner
-		pair['energy']=0
-		pair['initialenergy']=initialenergy
-		pair['direction'] = 'right' #initial spinning direction
-		pair['trace']=[pos1] #track the trace of the couple
-		pair['randomoffset']=math.sqrt(random.random()+0.5) #if necessary, couples can be manipulated with random skill properties
-		pair['pairdistance']=(pos2-pos1).length()
-		pair['maxenergy']=maxenergy
-		pair['leftdancer']=leftdancer
-		pair['mass']=mass
-		pair['index']=index
-		pair['identifier']=identifier
+		#add information to the couple table, all other properties were already taken from PAIRINFOS
+		pair=self.Couples[index]
+		pair.physicsnode=physicsnode
+		pair.pandanode=nodepath
+		pair.randomoffset=math.sqrt(random.random()+0.5) #if necessary, couples can be manipulated with random skill properties
+		pair.pairdistance=(pos2-pos1).length()
 		return pair
 		
-	def DrawTrace(self,thick=2.0):
-		"""Routine to draw lines with a defined thickness on the ballroom floor.
+	def DrawTrace(self):
+		"""Routine to draw lines on the ballroom floor (see TraceRenderer).
 		The line is white if the spinning dancer was the following part, black if the
 		spinning dancer was the leading part.
-		
-		Unfortunately, this routine is a massive overhead if the simulation is long..
-		
-		Input:
-		thick (float) line width
 		"""
-		for p in self.Pairs:
-			try: #lines are drawn with LineSegs which need to be created once and can be appende furthermore
-				pos=p['pandanode'].getChild(p['white']).getPos(self.render)
-				newpos=Point3(pos[0],pos[1],0.1)
-				oldpos=p['lineposwhite']
-				ls= LineSegs()
-				ls.setColor(1,1,1,0)
-				ls.setThickness(thick)
-				ls.moveTo(oldpos)
-				ls.drawTo(newpos)
-				node=p['linenodewhite']
-				ls.create(node)
-				p['lineposwhite']=newpos
-				
-				pos=p['pandanode'].getChild(int(not p['white'])).getPos(self.render)
-				newpos=Point3(pos[0],pos[1],0.1)
-				oldpos=p['lineposblack']
-				ls= LineSegs()
-				ls.setColor(0,0,0,0)
-				ls.setThickness(thick)
-				ls.moveTo(oldpos)
-				ls.drawTo(newpos)
-				node=p['linenodeblack']
-				ls.create(node)
-				p['lineposblack']=newpos
-			except:
-				ls= LineSegs()
-				node = ls.create()
-				ls.setColor(1,1,1,0)
-				ls.setThickness(thick)
-				NodePath(node).reparentTo(self.render)
-				NodePath(node).setShaderOff()
-				pos=p['pandanode'].getChild(p['white']).getPos(self.render)
-				p['lineposwhite']=Point3(pos[0],pos[1],0.1)
-				p['linenodewhite']=node
-				
-				ls= LineSegs()
-				node = ls.create()
-				ls.setColor(0,0,0,0)
-				ls.setThickness(thick)
-				NodePath(node).reparentTo(self.render)
-				NodePath(node).setShaderOff()
-				pos=p['pandanode'].getChild(int(not p['white'])).getPos(self.render)
-				p['lineposblack']=Point3(pos[0],pos[1],0.1)
-				p['linenodeblack']=node
+		white=list()
+		black=list()
+		for nodepath,w in zip(self.Couples.pandanode,self.Couples.white.tolist()):
+			white.append(nodepath.getChild(w).getPos(self.render))
+			black.append(nodepath.getChild(1-w).getPos(self.render))
+		self.Traces.Draw(white,black)
 				
 	################################################################################# ROUTINES FOR TARGETED BEHAVIOUR ####################################
 	
-	def VectorFieldEllipseSq(self,pos,pair,adb=None):
-		""" Routine to calculate which point a dance couple
-		should target to remain on an elliptic trajectory.
+	def RelativeAngleDeg(self,v1,v2):
+		""" Signed angle from each vector in v1 to the vector in v2, for many vectors at once
+		with the formula of Vec3.relativeAngleDeg: atan2 of the z component of the cross product
+		and the 3D dot product (panda includes z in the dot product).
+		The angles are computed in double precision, panda computes them in single precision,
+		so they differ by its rounding (below 1e-4 degree).
 		
 		Input:
-		pos (Vec3) position of the dance partner that will be the rotation axis in this move
-		pair (dict) Pair object
-		adb (float) ratio between a and b of the ellipsis (a/b=adb)
-		"""
+		v1,v2 (numpy.array Nx3) vectors
 		
-		if adb==None:
-			adb=self.ballroomsize[0]/self.ballroomsize[1]
-		mina=self.ballroomsize[0]*0.5*0 #couples that are on an ellipse, so that the main axle is smaller than this, are detracted
-		maxa=self.ballroomsize[0]*0.5*0.8 #couples that are on an ellipse, so that the main axle is larger than this, are attracted to the centre
-		
-		x=pos[0]
-		y=pos[1]
-		
-		#calculate tangent
-		dx=-pos[1]**3*adb**4
-		dy=pos[0]**3
-		
-		a = (pos[0]**4+adb**4*pos[1]**4)**0.25
-		if a<mina: #detract from center
-			fac=(mina-a)/mina*0.1
-		elif a>maxa: #attract to center
-			fac=-(a-maxa)/maxa*0.1
-		else:
-			fac=0
-		
-		return Vec3(dx+fac*x,dy+fac*y,0)
+		Output:
+		(numpy.array N) angles in degree
+		"""
+		cross=v1[:,0]*v2[:,1]-v1[:,1]*v2[:,0]
+		dot=np.sum(v1*v2,axis=1)
+		return np.degrees(np.arctan2(cross,dot))
 		
 	################################################################################# ROUTINES FOR VELOCITY UPDATE ####################################		
 	
-	def EnergyFactor(self,pair):
+	def EnergyFactors(self):
 		""" To find a relation between targeted angle and 
 		spin velocity we assume that there is a linear realtionship:
 			spinningvelocity*X = angle
-		This routine tries to approximate X using the trace of the pair
+		This routine tries to approximate X using the trace of the pairs
 		comparing danced angles and applied velocities.
 		
-		Input:
-		pair (dict) dance couple
+		The factors energy**0.5*beatlength/angle of all previous spins are
+		collected in a running median per couple (self.Couples.factors), which
+		is updated once per spin in CalculateEnergyVectorfield.
 		
 		Output:
-		(float) estimation for X
+		(numpy.array N) estimation for X per couple
 		"""
 		
-		fac=list()
-		for ang,energy,bl in zip(pair['angles'],pair['energies'],pair['beatlengths']):
-			f=energy**0.5*bl/ang
-			fac.append(f)
-		L=list(zip(fac,pair['angles'],pair['energies']))
-		L.sort(key=lambda x: x[0])
-		
 		#beatlength estimate
-		try:
-			bl=statistics.median(pair['beatlengths'][-3:])
-		except:
-			bl=pair['beatlengths'][-1]
+		bl=statistics.median(self.Couples.History(self.Couples.beatlengths,3).tolist())
 		
 		#take median of the factors as it is not so influenced by outliers
-		return statistics.median(fac)/bl
+		return np.array([x.Median() for x in self.Couples.factors])/bl
 		
-	def CalculateEnergyVectorfield(self,pair):
+	def CalculateEnergyVectorfield(self):
 		""" Energy update as done in the trajectory-strategy. 
 		Tries to adapt the kinetic energy to stay on a given track.
 		
 		The strategy is based on the idea, that there exists a
 		pair-specific unknown factor X, so that
 		(spinningenergy**0.5)*X = angle
-		To approximate X, the routine EnergyFactor is used
+		To approximate X, the routine EnergyFactors is used
 		
-		Input:
-		pair (dict) dance couple
+		All couples are updated at once, only the energy factor
+		is estimated per couple.
 		
 		Output:
-		(float) new spin-energy of the couple
+		(numpy.array N) new spin-energies of the couples
+		(numpy.array N bool) new spinning directions (True if left)
 		"""
+		C=self.Couples
 		
-		T=pair['trace'] #get trace of the pair
+		if len(self.recentpositions)<3: #if the trace of the couples is not long enough (i.e. at the start of the simulation) the angle of the last spin cannot be evaluated and the angle necessary for the next spin cannot be determined
+			return C.initialenergy.copy(),C.leftspin.copy()
 		
-		if len(T)>2: #if the trace of the couple is not long enough (i.e. at the start of the simulation) the angle of the last spin cannot be evaluated and the angle necessary for the next spin cannot be determined
+		p1,p2,p3=self.recentpositions #former position of partner A, position of partner B, position of partner A
 		
-			energy=pair['energy'] #get current energy of the pair
-			direction=pair['direction']
-			
-			p1=T[-3] #former position of partner A
-			p2=T[-2] #position of partner B
-			p3=T[-1] #position of partner A
-			
-			v1=p2-p1 #old couple-vector
-			v2=p3-p2 #new couple-vector
-			
-			
-			# first, observe the previous spin!
-			if direction=='right':
-				oldangle=180.0-v1.relativeAngleDeg(v2) #get angle of the previous spin
-			else:
-				oldangle=180.0+v1.relativeAngleDeg(v2) #get angle of the previous spin
-			#print('previous energy: '+str(energy)+' lead to angle: '+str(oldangle))
-			#check how to choose new velocity
-			try:
-				pair['angles'].append(oldangle)
-				pair['energies'].append(abs(energy))
-				pair['beatlengths'].append(self.currentbeatlength)
-			except:
-				pair['angles']=[oldangle]
-				pair['energies']=[abs(energy)]
-				pair['beatlengths']=[self.currentbeatlength]
-				
-				
-			#get the pair-specific energy factor
-			factor=self.EnergyFactor(pair)
-			
-			#Get the target vector/angle:
-			v3=self.VectorFieldEllipseSq(p3,pair)
-			#v3=self.VectorFieldSquare(p3,pair)
-			
-			#calculate the necessary angles for right/left spin on track
-			rightangle=180.0-v2.relativeAngleDeg(v3) #Calculate the target angle if spinning right (default)
-			leftangle=(360.0-rightangle)
-	
-			#necessary energies for right/left spin on track,
-			# assume that the next beat will take as long as the last one!
-			maxenergy=pair['maxenergy']
-			leftdancer=pair['leftdancer']
-			
-			rightenergy=(rightangle*factor)**2
-			leftenergy=(leftangle*factor)**2
-			defaultenergy=min((self.defaultangle*factor)**2,maxenergy)
-			
-			#print('need angle of '+str(rightangle)+' which would require energy of: '+str(rightenergy))
-			
-			tolerance=1.3
-			
-			if direction == 'right':
-				if rightenergy<maxenergy: #no problem, dance right
-					return rightenergy,'right'
-				else:
-					if leftdancer==True and leftenergy<maxenergy: #if skilled enough and it helps, switch to left
-						return leftenergy,'left'
-					elif rightenergy<tolerance*maxenergy: #if the pair can almost make it, do it
-						return maxenergy,'right'
-					else: #no chance, make a pause
-						return defaultenergy,'right'
-			else:
-				if leftenergy<maxenergy: #no problem, dance left
-					return leftenergy,'left'
-				else:
-					if rightenergy<maxenergy: #if it helps, switch to right
-						return rightenergy,'right'
-					elif leftenergy<tolerance*maxenergy: #if the pair can almost make it, do it
-						return maxenergy,'left'
-					else: #no chance, make a pause
-						return defaultenergy,'left'
-		else:
-			return pair['initialenergy'],pair['direction']
+		v1=p2-p1 #old couple-vector
+		v2=p3-p2 #new couple-vector
+		
+		# first, observe the previous spin!
+		relangle=self.RelativeAngleDeg(v1,v2)
+		oldangle=np.where(C.leftspin,180.0+relangle,180.0-relangle) #get angle of the previous spin
+		energy=np.abs(C.energy)
+		C.AppendHistory(oldangle,energy,self.currentbeatlength)
+		factors=np.sqrt(energy)*self.currentbeatlength/oldangle
+		for estimator,f in zip(C.factors,factors.tolist()):
+			estimator.Add(f)
+		
+		#get the pair-specific energy factors
+		factor=self.EnergyFactors()
+		
+		#Get the target vector/angle:
+		v3=self.GuidanceField(p3)
+		
+		#calculate the necessary angles for right/left spin on track
+		rightangle=180.0-self.RelativeAngleDeg(v2,v3) #Calculate the target angle if spinning right (default)
+		leftangle=(360.0-rightangle)
+		
+		#necessary energies for right/left spin on track,
+		# assume that the next beat will take as long as the last one!
+		maxenergy=C.maxenergy
+		
+		rightenergy=(rightangle*factor)**2
+		leftenergy=(leftangle*factor)**2
+		defaultenergy=np.minimum((self.defaultangle*factor)**2,maxenergy)
+		
+		tolerance=1.3
+		
+		#spinning right: no problem, dance right / if skilled enough and it helps, switch to left /
+		#if the pair can almost make it, do it / no chance, make a pause
+		switchleft=C.leftdancer&(leftenergy<maxenergy)
+		fromright=np.select([rightenergy<maxenergy,switchleft,rightenergy<tolerance*maxenergy],[rightenergy,leftenergy,maxenergy],defaultenergy)
+		fromrightleft=~(rightenergy<maxenergy)&switchleft
+		
+		#spinning left: no problem, dance left / if it helps, switch to right /
+		#if the pair can almost make it, do it / no chance, make a pause
+		switchright=~(leftenergy<maxenergy)&(rightenergy<maxenergy)
+		fromleft=np.select([leftenergy<maxenergy,switchright,leftenergy<tolerance*maxenergy],[leftenergy,rightenergy,maxenergy],defaultenergy)
+		fromleftleft=~switchright
+		
+		return np.where(C.leftspin,fromleft,fromright),np.where(C.leftspin,fromleftleft,fromrightleft)
 		
 	################################################################################# ROUTINES TO MANAGE DANCING ####################################		
 	
@@ -518,10 +576,13 @@ class Simulation(ShowBase):
 		Hereby the rotation axis is moved from one to the other dance partner
 		and the velocity is updated.
 		"""
-		for pair in self.Pairs:
-			#print('Investigating pair '+str(pair['index']))
-			pos=pair['pandanode'].getChild(1).getPos(self.render)
-			pair['trace'].append(pos)
+		C=self.Couples
+		P=self.Profiler
+		start=P.Clock()
+		positions=np.empty((self.PAIRNUMBER,3))
+		for i,nodepath in enumerate(C.pandanode):
+			pos=nodepath.getChild(1).getPos(self.render)
+			positions[i]=(pos[0],pos[1],pos[2])
 			
 			#Unfortunately BulletPhysics does not allow to change the center of
 			#a rigid object to a different spot inside the object which
@@ -530,30 +591,31 @@ class Simulation(ShowBase):
 			#	1 manually turn the object by 180 degrees
 			#	2 manually turn the 3d model of the body by 180 degrees (now it is back to normal)
 			
-			hprold=pair['pandanode'].getHpr()
-			pair['pandanode'].setPos(pos)
-			pair['pandanode'].setHpr(Point3(hprold[0]+180.0,0,0))
-			model=pair['pandanode'].getChild(2)
+			hprold=nodepath.getHpr()
+			nodepath.setPos(pos)
+			nodepath.setHpr(Point3(hprold[0]+180.0,0,0))
+			model=nodepath.getChild(2)
 			hprold=model.getHpr()
 			model.setHpr(Point3(hprold[0]+180.0,hprold[1],hprold[2]))
-			
-			#calulate the new velocity:
-			energy,direction = self.CalculateEnergyVectorfield(pair)
-			pair['energy']=energy
-			pair['direction']=direction
-			#estimate angular velocity based on energy
-			abstangentialvelocity = (4*energy/pair['mass'])**0.5   # E=mv^2/2  and assume that m=pair['mass']/2 
-			if direction=='left':
-				angularvelocity=abstangentialvelocity/pair['pairdistance']
-			else:
-				angularvelocity=-abstangentialvelocity/pair['pairdistance']
-				
-			#print('applying energy: '+str(energy)+' with angular velocity '+str(angularvelocity))
-			#apply angular velocity
-			pair['physicsnode'].setAngularVelocity(Vec3(0,0,angularvelocity))
-			pair['physicsnode'].setLinearVelocity(Vec3(0,0,0)) #in any case, stop the linar velocity of the object!
-			pair['white']=int(not pair['white']) #switch the index of the following partner
-			#print('##################################################')
+		C.AppendTrace(positions[:,:2])
+		self.recentpositions.append(positions)
+		P.Add('change.axes',start)
+		
+		#calulate the new velocities:
+		start=P.Clock()
+		C.energy[:],C.leftspin[:] = self.CalculateEnergyVectorfield()
+		P.Add('change.energy',start)
+		start=P.Clock()
+		#estimate angular velocity based on energy
+		abstangentialvelocity = np.sqrt(4*C.energy/C.mass)   # E=mv^2/2  and assume that m=pair['mass']/2 
+		angularvelocity=np.where(C.leftspin,1.0,-1.0)*abstangentialvelocity/C.pairdistance
+		
+		#apply angular velocity
+		for physicsnode,w in zip(C.physicsnode,angularvelocity.tolist()):
+			physicsnode.setAngularVelocity(Vec3(0,0,w))
+			physicsnode.setLinearVelocity(Vec3(0,0,0)) #in any case, stop the linar velocity of the object!
+		C.white^=1 #switch the index of the following partner
+		P.Add('change.velocities',start)
 	
 	################################################################################# ROUTINES TO MANAGE UPDATES (AND CAMERA POSITIONS) ####################################
 		
@@ -567,79 +629,379 @@ class Simulation(ShowBase):
 		
 		Output:
 		task.cont (TaskMgr.cont) note that the task manager should repeat calling this function
+		task.done (TaskMgr.done) if the simulation is finished (the task manager is stopped as well)
 		"""
-		#first, make a screenshot
-		if self.movie==True:
+		for tick in range(self.renderevery): #only the last of these time-steps is rendered
+			if self.Step()==False:
+				self.taskMgr.stop()
+				return task.done
+		if self.Quality is not None:
+			self.Quality.Update(globalClock.getDt())
+		return task.cont
+	
+	def Step(self):
+		""" Simulates one frame (time-step) of the simulation.
+		Called by the task manager if the simulation is rendered, or
+		directly in a loop by Run if the simulation is headless.
+		
+		Output:
+		(bool) False if the simulation is finished, True otherwise
+		"""
+		P=self.Profiler
+		stepstart=P.Clock()
+		#first, make a screenshot (of the frames that were rendered)
+		if self.movie==True and self.frames%self.renderevery==0:
+			start=P.Clock()
 			self.Image()
+			P.Add('image',start)
 		#check if simulation is finished
-		if self.time>=self.TEND:
-			self.finalStuff()
+		if self.frames>=self.ENDFRAME:
+			self.RESULTS=self.finalStuff()
+			self.finished=True
+			return False
 		
 		#do, what happens every frame!
+		ind=self.BEATSCHEDULER.Beat(self.frames)
+		if self.CHECKPOINTFILENAME is not None and ind is not None and ind>0 and ind%self.checkpointevery==0:
+			start=P.Clock()
+			self.SaveCheckpoint(self.CHECKPOINTFILENAME) #the state right before the beat
+			P.Add('checkpoint',start)
 		if self.tracetype==1: #if trace==1,every frame draws a line (not recommended - much overhead!)
-			self.DrawTrace(2.0)
-		if self.frames in self.BEATFRAMES: #beat - change the spin axis!
+			start=P.Clock()
+			self.DrawTrace()
+			P.Add('trace',start)
+		if ind is not None: #beat - change the spin axis!
+			P.Beat()
+			P.Count('beats')
 			if self.tracetype==2:
-				self.DrawTrace(2.0)
+				start=P.Clock()
+				self.DrawTrace()
+				P.Add('trace',start)
 			self.spinnumber+=1
-			#calculate length of previous measure
-			ind=self.BEATFRAMES.index(self.frames)
+			#length of previous measure
 			if ind>0:
-				self.currentbeatlength=self.BEATFRAMES[ind]-self.BEATFRAMES[ind-1]
+				self.currentbeatlength=self.BEATSCHEDULER.BeatLength(ind)
+				if self.Telemetry is not None:
+					leftspin=self.Couples.leftspin.copy()
+				start=P.Clock()
 				self.Change()
+				P.Add('change',start)
+				if self.Telemetry is not None:
+					self.SendBeat(ind,leftspin)
 			else:
 				None  #wait for the first beat to pass, to understand the music!
-		self.world.doPhysics(self.dt) #make movement and collisions
-		for identifier in self.PAIRIDENTIFIERS:
-			Contacts=[sum([self.world.contactTestPair(P['physicsnode'],Q['physicsnode']).getNumContacts() for Q in self.Pairs if P!=Q]) for i,P in enumerate(self.Pairs) if P['identifier']==identifier]
-			Contacts=sum(Contacts)/len([x for x in self.Pairs if x['identifier']==identifier]) #get observed contacts between dancers per dancer
-			self.TOTALCOLLISIONS[identifier]+=Contacts
+		start=P.Clock()
+		for world in self.Worlds:
+			if self.substeps is None:
+				world.doPhysics(self.dt) #make movement and collisions
+			else:
+				substep=self.dt/self.substeps
+				for k in range(self.substeps): #fixed sub-steps, exactly one bullet step per call
+					world.doPhysics(substep,1,substep)
+		P.Add('physics',start)
+		start=P.Clock()
+		if self.collisionmode!='episodes':
+			self.CountCollisions()
+		if self.Episodes is not None:
+			self.TrackContacts()
+		P.Add('collisions',start)
 
 		#update time
 		self.frames+=1
-		self.time+=self.dt
+		self.time=self.frames*self.dt #no accumulated rounding errors
+		P.Count('frames')
+		P.Add('step',stepstart)
 		#print(self.time)
-		return task.cont
+		return True
 		
+	def CountCollisions(self):
+		""" Adds the contacts between the couples of the current frame to TOTALCOLLISIONS.
+		For every couple, the contacts with all other couples are summed up and
+		averaged over all couples with the same identifier.
+		
+		Only couples of the same ballroom that are close enough (see CollisionGrid) are tested,
+		and every unordered pair is tested once. The contacts of a pair are counted for both couples,
+		exactly as if each couple had been tested against all others.
+		"""
+		C=self.Couples
+		render=self.render
+		positions=list()
+		for nodepath,pairdistance in zip(C.pandanode,C.pairdistance.tolist()):
+			centre=render.getRelativePoint(nodepath,Point3(pairdistance*0.5,0,0))
+			positions.append((centre[0],centre[1]))
+		positions=np.array(positions).reshape(-1,2)
+		
+		Contacts={x:0 for x in self.PAIRIDENTIFIERS}
+		first,second=self.CollisionGrid.CandidatePairsArray(positions,self.BALLROOM if len(self.Worlds)>1 else None)
+		for i,j in zip(first.tolist(),second.tolist()):
+			n=self.Worlds[self.BALLROOM[i]].contactTestPair(C.physicsnode[i],C.physicsnode[j]).getNumContacts()
+			if n>0:
+				Contacts[self.COLLISIONGROUPS[i]]+=n
+				Contacts[self.COLLISIONGROUPS[j]]+=n
+		self.Profiler.Count('contacttests',len(first))
+		self.Profiler.Count('contacts',sum(Contacts.values())//2)
+		for identifier in self.PAIRIDENTIFIERS:
+			self.TOTALCOLLISIONS[identifier]+=Contacts[identifier]/self.IDENTIFIERCOUNTS[identifier] #get observed contacts between dancers per dancer
+		
+	def TrackContacts(self):
+		""" Begins and ends the contact episodes of the current frame (see ContactEpisodes).
+		If only episodes are counted, every new episode is added to TOTALCOLLISIONS for both couples,
+		averaged over all couples with the same identifier.
+		"""
+		touching=self.Episodes.Touching(self.Worlds)
+		begun=self.Episodes.Update(touching,(self.frames+1)*self.dt,self.ImpactSpeed)
+		if self.collisionmode=='episodes':
+			for pair in begun:
+				for k in pair:
+					identifier=self.COLLISIONGROUPS[k]
+					self.TOTALCOLLISIONS[identifier]+=1/self.IDENTIFIERCOUNTS[identifier]
+		self.Profiler.Count('episodes',len(begun))
+	
+	def ImpactSpeed(self,i,j,manifold):
+		""" Relative speed of two couples along the contact normal, the largest over the contact points of the manifold
+		"""
+		C=self.Couples
+		a,b=(i,j) if manifold.getNode0().getName()==C.physicsnode[i].getName() else (j,i)
+		speed=0.0
+		for k in range(manifold.getNumManifoldPoints()):
+			point=manifold.getManifoldPoint(k)
+			va=self.PointVelocity(a,point.getPositionWorldOnA())
+			vb=self.PointVelocity(b,point.getPositionWorldOnB())
+			speed=max(speed,abs((va-vb).dot(point.getNormalWorldOnB())))
+		return speed
+	
+	def PointVelocity(self,index,point):
+		""" Velocity of the body of a couple at a point (in world coordinates)
+		"""
+		physicsnode=self.Couples.physicsnode[index]
+		r=point-self.Couples.pandanode[index].getPos(self.render)
+		return physicsnode.getLinearVelocity()+physicsnode.getAngularVelocity().cross(r)
+	
+	def EpisodeResults(self):
+		""" Ends the open contact episodes and returns their results per identifier (see ContactEpisodes.Results),
+		None if no episodes are tracked
+		"""
+		if self.Episodes is None:
+			return None
+		self.Episodes.Finish(self.time)
+		return self.Episodes.Results(self.IDENTIFIERCOUNTS)
+	
+	def TelemetryName(self):
+		return str(self.SCENARIONAME) if self.SCENARIONAME is not None else 'run'+str(os.getpid())
+	
+	def TelemetryCollisions(self):
+		""" TOTALCOLLISIONS with string keys (the groups of a BatchSimulation are (ballroom,identifier))
+		"""
+		return {(':'.join([str(x) for x in key]) if isinstance(key,tuple) else key):value for key,value in self.TOTALCOLLISIONS.items()}
+	
+	def SendBeat(self,ind,leftspin):
+		""" Sends the summary of the last beat to the telemetry (see Telemetry), never waits
+		
+		Input:
+		ind (int) index of the beat
+		leftspin (numpy.array bool) spinning directions of the couples before the beat
+		"""
+		now=time.perf_counter()
+		frames=self.frames-self.beatframe
+		self.Telemetry.Push({'type':'beat','run':self.TelemetryName(),'beat':ind,'frame':self.frames,'time':self.time,
+			'steptime':(now-self.beatclock)/frames if frames>0 else 0.0,'collisions':self.TelemetryCollisions(),
+			'energy':float(self.Couples.energy.mean()) if self.PAIRNUMBER>0 else 0.0,
+			'switches':int(np.count_nonzero(self.Couples.leftspin!=leftspin)),'dropped':self.Telemetry.dropped})
+		self.beatclock=now
+		self.beatframe=self.frames
+	
+	def CloseTelemetry(self):
+		""" Sends the final collisions and waits until the telemetry is written
+		"""
+		if self.Telemetry is None:
+			return
+		self.Telemetry.Push({'type':'end','run':self.TelemetryName(),'frame':self.frames,'time':self.time,
+			'collisions':self.TelemetryCollisions(),'dropped':self.Telemetry.dropped})
+		self.Telemetry.Close()
+	
 	def finalStuff(self):
+		""" Saves the results of the simulation (if the files are specified) and returns them
+		
+		Output:
+		results (dict) scenario name, number of frames, simulated time, the collisions and the number of couples per identifier,
+					the contact episodes per identifier (if tracked, see collisionmode), the setup time of the simulation and the time of the run (s)
+		"""
 		print(self.TOTALCOLLISIONS)
+		if self.movie==True:
+			self.Movie.Close() #wait for the last images to be saved
+		if self.tracetype>0:
+			self.Profiler.Set('tracevertices',self.Traces.Vertices())
+		self.Profiler.Finish()
+		self.CloseTelemetry()
+		results=dict()
+		results['scenarioname']=self.SCENARIONAME
+		results['frames']=self.frames
+		results['time']=self.time
+		results['collisions']=dict(self.TOTALCOLLISIONS)
+		results['couples']=dict(self.IDENTIFIERCOUNTS)
+		episodes=self.EpisodeResults()
+		if episodes is not None:
+			results['episodes']=episodes
+		results['setup']=self.setuptime
+		results['runtime']=time.perf_counter()-self.runstart
+		
 		#save collisioncount
+		if self.RESULTFILENAME is not None and self.RESULTFILENAME.endswith('.csv')==False:
+			store=ResultStore(self.RESULTFILENAME)
+			store.Add(results,self.PARAMETERS)
+			store.Close()
+		elif self.RESULTFILENAME is not None:
+			self.AppendCSV(self.SCENARIONAME,self.TOTALCOLLISIONS)
+		#the traces of the pairs are already saved, convert them if JSON is requested
+		if self.JSONFILENAME is not None:
+			TraceFile.ToJSON(self.TRACEFILENAME,self.JSONFILENAME)
+		return results
+		
+	def AppendCSV(self,scenarioname,collisions):
+		""" Appends a ;-separated row of earlier versions (without header and parameters) to the result file
+		
+		Input:
+		scenarioname (str) first column of the row
+		collisions (dict) identifier -> collisions per couple
+		"""
 		string=''
-		for identifier in self.PAIRIDENTIFIERS:
-			string+=';'+identifier+';'+str(self.TOTALCOLLISIONS[identifier])
+		for identifier in sorted(collisions):
+			string+=';'+identifier+';'+str(collisions[identifier])
 		try:
 			f=open(self.RESULTFILENAME,'a')
-			f.write('\n'+str(self.SCENARIONAME)+';'+string)
+			f.write('\n'+str(scenarioname)+';'+string)
 			f.close()
 		except:
 			f=open(self.RESULTFILENAME,'w')
-			f.write(str(self.SCENARIONAME)+';'+string)
+			f.write(str(scenarioname)+';'+string)
 			f.close()
-		#save traces of pairs
-		Q=list()
-		for pair in self.Pairs:
-			tr=[[x[0],x[1]] for x in pair['trace']]
-			a={'index':pair['index'],'coordinates':tr}
-			Q.append(a)
-		with open(self.TRACEFILENAME,'w') as f:
-			json.dump(Q,f,sort_keys = True, indent = 4)
-		exit()
 		
 	################################################################################# BUEROCRATIC ROUTINES ####################################
 		
-	def Run(self,scenarioname,resultfilename='Results/Results.csv',tracefilename='Results/Traces.json'):
+	def Run(self,scenarioname,resultfilename='Results/Results.sqlite',tracefilename='Results/Traces.npy',checkpointfilename=None,checkpointevery=10,parameters=None):
+		""" Runs the simulation until the end time is reached
+		
+		Input:
+		scenarioname (str) identifier of the scenario in the result file
+		resultfilename (str) SQLite file the results are added to (see Results.ResultStore), None to skip writing them
+					if the name ends with .csv, a row is appended to a ;-separated file as in earlier versions
+		tracefilename (str) .npy file the traces of the couples are written to during the simulation (see TraceFile), None to skip writing it
+					if the name ends with .json, the traces are written to the corresponding .npy file and converted to JSON at the end
+		checkpointfilename (str) file the state of the simulation is saved to every checkpointevery beats (see SaveCheckpoint), None to skip it
+		checkpointevery (int) number of beats between two checkpoints
+		parameters (dict) parameters of the scenario (e.g. seed and musicfile) that are saved together with the results
+		
+		Output:
+		results (dict) see finalStuff
+		"""
 		self.RESULTFILENAME=resultfilename
 		self.TRACEFILENAME=tracefilename
+		self.JSONFILENAME=None
+		if tracefilename is not None:
+			if tracefilename.endswith('.json'):
+				self.JSONFILENAME=tracefilename
+				self.TRACEFILENAME=tracefilename[:-len('.json')]+'.npy'
+			self.Couples.StreamTrace(self.TRACEFILENAME)
 		self.SCENARIONAME=scenarioname
-		taskMgr.add(self.UpdateBallroom, 'update')
-		base.run()
+		self.PARAMETERS=parameters
+		self.runstart=time.perf_counter()
+		self.beatclock=self.runstart #start of the current beat (see SendBeat)
+		self.beatframe=self.frames
+		self.CHECKPOINTFILENAME=checkpointfilename
+		self.checkpointevery=checkpointevery
+		if self.headless==True: #no task manager, just step through the frames until the simulation is finished
+			while self.Step()==True:
+				None
+		else:
+			taskMgr.add(self.UpdateBallroom, 'update')
+			base.run()
+		return self.RESULTS
+		
+	def SaveCheckpoint(self,filename):
+		""" Saves the state of the simulation (between two time-steps) into a compressed file:
+		the transforms and velocities of all couples, the state of the couples (see CoupleTable.State),
+		the collisions, the frame counter and the state of the random number generator.
+		
+		A checkpoint can be loaded into a new simulation with the same number of couples (see LoadCheckpoint),
+		either to resume a simulation or to start several variants from the same state.
 		
+		Input:
+		filename (str) checkpoint file
+		"""
+		C=self.Couples
+		state=dict()
+		state['version']=1
+		state['dt']=self.dt
+		state['frames']=self.frames
+		state['spinnumber']=self.spinnumber
+		state['currentbeatlength']=self.currentbeatlength
+		state['TOTALCOLLISIONS']=dict(self.TOTALCOLLISIONS)
+		if self.Episodes is not None:
+			state['episodes']=self.Episodes.State()
+		state['random']=random.getstate()
+		state['recentpositions']=list(self.recentpositions)
+		state['couples']=C.State()
+		state['bodies']=[nodepath.getTransform() for nodepath in C.pandanode] #TransformStates are stored exactly as they are
+		state['models']=[nodepath.getChild(2).getTransform() for nodepath in C.pandanode]
+		state['linearvelocity']=np.array([tuple(node.getLinearVelocity()) for node in C.physicsnode]).reshape(-1,3)
+		state['angularvelocity']=np.array([tuple(node.getAngularVelocity()) for node in C.physicsnode]).reshape(-1,3)
+		with gzip.open(filename+'.tmp','wb') as f:
+			pickle.dump(state,f,protocol=pickle.HIGHEST_PROTOCOL)
+		os.replace(filename+'.tmp',filename) #a crash while saving does not destroy the previous checkpoint
+	
+	def LoadCheckpoint(self,filename,restorerandom=True):
+		""" Continues the simulation from a checkpoint (see SaveCheckpoint).
+		The simulation has to be created with the same number of couples. The static properties
+		of the couples (maxenergy, mass, ...), the end time and all other settings are taken from
+		the new simulation, so variants of a scenario can be started from a shared state.
+		
+		Note that internal caches of bullet (e.g. the contact points of the last step) are not saved,
+		so a resumed simulation can deviate from an uninterrupted one.
+		
+		Input:
+		filename (str) checkpoint file
+		restorerandom (bool) if True, the random number generator continues from the saved state
+		"""
+		with gzip.open(filename,'rb') as f:
+			state=pickle.load(f)
+		if state['dt']!=self.dt:
+			raise ValueError('the checkpoint uses a time-step of '+str(state['dt'])+' s')
+		C=self.Couples
+		C.Restore(state['couples'])
+		self.frames=state['frames']
+		self.time=self.frames*self.dt
+		self.spinnumber=state['spinnumber']
+		self.currentbeatlength=state['currentbeatlength']
+		self.TOTALCOLLISIONS={x:state['TOTALCOLLISIONS'].get(x,0) for x in self.PAIRIDENTIFIERS}
+		if self.Episodes is not None and 'episodes' in state:
+			self.Episodes.Restore(state['episodes'])
+		self.recentpositions=deque(state['recentpositions'],maxlen=3)
+		if restorerandom==True:
+			random.setstate(state['random'])
+		for i,(nodepath,physicsnode) in enumerate(zip(C.pandanode,C.physicsnode)):
+			nodepath.setTransform(state['bodies'][i])
+			nodepath.getChild(2).setTransform(state['models'][i])
+			physicsnode.setLinearVelocity(Vec3(*state['linearvelocity'][i].tolist()))
+			physicsnode.setAngularVelocity(Vec3(*state['angularvelocity'][i].tolist()))
+	
 	def Image(self):
+		""" Saves the last rendered frame as the next image of the movie (see MovieRecorder)
+		"""
 		filename=str(self.imagenumber)
 		filename='0'*(5-len(filename))+filename
 		filename='Images/'+filename+'.png'
-		self.MakeScreenshot(filename)
-		self.imagenumber+=1
+		if self.Movie.Capture(filename)==True:
+			self.imagenumber+=1
+	
+	def HideRender(self):
+		""" Hides the scene in the window, if a movie is made
+		it is still shown to the camera of the movie
+		"""
+		if self.movie==True:
+			self.cam.node().setCameraMask(BitMask32.bit(1))
+			self.render.hide(BitMask32.bit(1))
+		else:
+			self.render.hide()
 		
 	def MakeScreenshot(self,filename):
 		if self.renderType==False:
@@ -659,4 +1021,4 @@ class Simulation(ShowBase):
 		tex.write(filename)
 		base.graphicsEngine.removeWindow(mybuffer)
 		if self.renderType==False:
-			self.render.hide()
\ No newline at end of file
+			self.HideRender()
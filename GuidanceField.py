@@ -0,0 +1,140 @@
+""" Vector fields that guide the couples around the ballroom.
+
+A guidance field returns for every position on the floor the direction the couples should
+move to, e.g. along an ellipse around the centre of the floor. Fields are called with an array
+of positions (N x 2 or N x 3) and return an array of vectors (N x 3, z=0), so all couples are
+evaluated at once.
+
+Fields:
+	SuperellipseField - tangent to the curves |x|**p+|adb*y|**p=const, couples outside of maxa are
+					attracted to the centre (p=4 is the field of earlier versions, larger p are closer to a rectangle)
+	GridField - any field sampled once on a regular grid over the floor and bilinearly interpolated,
+				so the cost of a field does not depend on how expensive it is to evaluate
+
+New fields only need a __call__(pos) that returns the vectors.
+"""
+import numpy as np
+
+class SuperellipseField():
+	""" Couples dance counter-clockwise on superellipses |x|**p+|adb*y|**p=a**p around the centre of the floor.
+	Couples on a curve with a>maxa are attracted to the centre, couples with a<mina are pushed away from it.
+	"""
+
+	def __init__(self,ballroomsize,exponent=4,adb=None,mina=0.0,maxa=None):
+		""" Input:
+		ballroomsize ([float,float]) length and width of the floor
+		exponent (int) exponent p of the superellipse (an even number)
+		adb (float) ratio between the axes a and b, None for the ratio of the floor
+		mina (float) couples on curves with a smaller main axis are pushed away from the centre (0 to switch off)
+		maxa (float) couples on curves with a larger main axis are attracted to the centre, None for 80% of half the floor length
+		"""
+		self.exponent=exponent
+		self.adb=ballroomsize[0]/ballroomsize[1] if adb is None else adb
+		self.adbp=self.adb**exponent
+		self.mina=mina
+		self.maxa=ballroomsize[0]*0.5*0.8 if maxa is None else maxa
+
+	def __call__(self,pos):
+		""" Input:
+		pos (numpy.array Nx2 or Nx3) positions
+
+		Output:
+		(numpy.array Nx3) target vectors
+		"""
+		x=pos[:,0]
+		y=pos[:,1]
+		p=self.exponent
+
+		#calculate tangent
+		dx=-y**(p-1)*self.adbp
+		dy=x**(p-1)
+
+		a=(x**p+self.adbp*y**p)**(1.0/p)
+		fac=np.zeros(len(a))
+		attract=a>self.maxa #attract to center
+		fac[attract]=-(a[attract]-self.maxa)/self.maxa*0.1
+		if self.mina>0:
+			detract=a<self.mina #detract from center
+			fac[detract]=(self.mina-a[detract])/self.mina*0.1
+
+		return np.stack([dx+fac*x,dy+fac*y,np.zeros(len(a))],axis=1)
+
+def EllipseSqField(ballroomsize,adb=None):
+	""" Field of earlier versions (VectorFieldEllipseSq)
+	"""
+	return SuperellipseField(ballroomsize,4,adb)
+
+def SquareField(ballroomsize):
+	""" Couples follow the borders of the floor closely (nearly rectangular tracks)
+	"""
+	return SuperellipseField(ballroomsize,12)
+
+class GridField():
+	""" Samples a field once on a regular grid and interpolates it bilinearly.
+
+	Only the direction of the field matters for the couples, so the sampled vectors are normalised
+	(otherwise the interpolation would be dominated by the longest vectors). Positions outside of
+	the grid are evaluated with the field itself.
+	"""
+
+	def __init__(self,field,ballroomsize,resolution=0.25,margin=5.0):
+		""" Input:
+		field (callable) the field to sample (see above)
+		ballroomsize ([float,float]) length and width of the floor
+		resolution (float) distance between two grid points (m)
+		margin (float) the grid reaches this far beyond the borders of the floor (m)
+		"""
+		self.field=field
+		self.resolution=resolution
+		self.x0=-ballroomsize[0]*0.5-margin
+		self.y0=-ballroomsize[1]*0.5-margin
+		self.nx=int(np.ceil((ballroomsize[0]+2*margin)/resolution))+1
+		self.ny=int(np.ceil((ballroomsize[1]+2*margin)/resolution))+1
+		gx,gy=np.meshgrid(self.x0+np.arange(self.nx)*resolution,self.y0+np.arange(self.ny)*resolution,indexing='ij')
+		vectors=field(np.stack([gx.ravel(),gy.ravel()],axis=1))[:,:2]
+		length=np.hypot(vectors[:,0],vectors[:,1])
+		vectors=vectors/np.where(length>0,length,1.0)[:,None]
+		self.grid=vectors.reshape(self.nx,self.ny,2)
+
+	def __call__(self,pos):
+		""" Input:
+		pos (numpy.array Nx2 or Nx3) positions
+
+		Output:
+		(numpy.array Nx3) target vectors (interpolated directions of the field)
+		"""
+		u=(pos[:,0]-self.x0)/self.resolution
+		v=(pos[:,1]-self.y0)/self.resolution
+		inside=(u>=0)&(v>=0)&(u<self.nx-1)&(v<self.ny-1)
+		i=np.clip(u.astype(int),0,self.nx-2)
+		j=np.clip(v.astype(int),0,self.ny-2)
+		fu=np.clip(u-i,0,1)[:,None]
+		fv=np.clip(v-j,0,1)[:,None]
+		g=self.grid
+		vectors=(g[i,j]*(1-fu)*(1-fv)+g[i+1,j]*fu*(1-fv)+g[i,j+1]*(1-fu)*fv+g[i+1,j+1]*fu*fv)
+		result=np.zeros((len(pos),3))
+		result[:,:2]=vectors
+		if np.all(inside)==False:
+			result[~inside]=self.field(pos[~inside])
+		return result
+
+FIELDS={'ellipsesq':EllipseSqField,'square':SquareField}
+
+def MakeField(field,ballroomsize,resolution=None):
+	""" Creates a guidance field
+
+	Input:
+	field (str or callable) name of a field in FIELDS or a field (see above)
+	ballroomsize ([float,float]) length and width of the floor
+	resolution (float) if given, the field is sampled on a grid with this resolution (see GridField)
+
+	Output:
+	(callable) the field
+	"""
+	if isinstance(field,str):
+		if field not in FIELDS:
+			raise ValueError('unknown guidance field: '+field)
+		field=FIELDS[field](ballroomsize)
+	if resolution is not None:
+		field=GridField(field,ballroomsize,resolution)
+	return field
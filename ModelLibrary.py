@@ -0,0 +1,67 @@
+from panda3d.core import *
+import os
+
+class ModelLibrary():
+	""" Loads every 3D model of the couples only once.
+
+	The first request of a model loads the .egg file, flattens it (so that it consists of
+	as few geoms as possible) and keeps it as a prototype outside of the scene graph.
+	Every couple only gets an instance of the prototype (NodePath.instanceTo), i.e. all couples
+	with the same model share one node with its geometry and render state.
+	Note that every instance is still drawn with its own draw calls, since each instance
+	has its own transform.
+
+	If bamcache is True, the flattened prototype is also stored as .bam file next to the .egg
+	file, which loads much faster than the text format in later simulations. The .bam file is
+	renewed when the .egg file is newer.
+
+	If a RenderQuality is given, every prototype is an LODNode with simplified levels of the model.
+	"""
+
+	def __init__(self,loader,directory='Sources',bamcache=True,quality=None):
+		""" Input:
+		loader (Loader) loader of the ShowBase
+		directory (str) folder of the model files
+		bamcache (bool) if True, the flattened models are cached as .bam files
+		quality (RenderQuality) level of detail of the models, None to draw the full models only
+		"""
+		self.loader=loader
+		self.directory=directory
+		self.bamcache=bamcache
+		self.quality=quality
+		self.prototypes=dict()
+
+	def Prototype(self,modelname):
+		""" Output:
+		(NodePath) the shared prototype of the model
+		"""
+		if modelname not in self.prototypes:
+			model=self.Load(modelname)
+			if self.quality is not None:
+				model=self.quality.LOD(model)
+			model.setShaderAuto() #the same render state for all couples
+			self.prototypes[modelname]=model
+		return self.prototypes[modelname]
+
+	def Instance(self,modelname,parent):
+		""" Attaches an instance of the model to parent
+
+		Input:
+		modelname (str) file name of the model (.egg) in the model folder
+		parent (NodePath) node the instance is attached to
+
+		Output:
+		(NodePath) the instance
+		"""
+		return self.Prototype(modelname).instanceTo(parent)
+
+	def Load(self,modelname):
+		eggname=os.path.join(self.directory,modelname)
+		bamname=os.path.splitext(eggname)[0]+'.bam'
+		if self.bamcache==True and os.path.exists(bamname) and os.path.exists(eggname) and os.path.getmtime(bamname)>=os.path.getmtime(eggname):
+			return self.loader.loadModel(bamname,noCache=True)
+		model=self.loader.loadModel(eggname,noCache=True)
+		model.flattenStrong()
+		if self.bamcache==True and os.path.exists(eggname):
+			model.writeBamFile(Filename.fromOsSpecific(bamname)) #fails silently if the folder is read-only
+		return model
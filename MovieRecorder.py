@@ -0,0 +1,87 @@
+from panda3d.core import *
+import threading
+import queue
+
+class MovieRecorder():
+	""" Records the images of a movie with one off-screen buffer that is created once.
+	The buffer is rendered together with the window and copies its image into RAM,
+	saving the image files is done by background threads, so that the simulation
+	only has to wait if the threads fall behind by more than queuesize images.
+
+	Frames are saved as PNG (format 'png') or as the raw RGB bytes of the
+	image (format 'raw', bottom row first), which is much faster to write.
+	"""
+
+	def __init__(self,base,width=6400,height=3600,format='png',workers=2,queuesize=4):
+		""" Input:
+		base (ShowBase) the simulation
+		width,height (int) resolution of the images
+		format (str) 'png' or 'raw'
+		workers (int) number of threads that save the images
+		queuesize (int) maximum number of images waiting to be saved
+		"""
+		if format not in ['png','raw']:
+			raise ValueError('unknown image format: '+str(format))
+		self.format=format
+		self.width=width
+		self.height=height
+
+		self.tex=Texture()
+		self.buffer=base.win.makeTextureBuffer('MovieBuffer',width,height,self.tex,True) #True: copy the image into RAM after rendering
+		self.buffer.setClearColor(base.getBackgroundColor())
+		#own camera that follows the camera of the window, so that the movie can be shown to this camera only (see CameraMask)
+		self.camera=base.makeCamera(self.buffer,lens=base.camLens,mask=self.CameraMask())
+		self.camera.reparentTo(base.cam)
+		self.camera.node().setScene(base.render)
+
+		self.queue=queue.Queue(maxsize=queuesize)
+		self.threads=[threading.Thread(target=self.Worker,daemon=True) for x in range(workers)]
+		for t in self.threads:
+			t.start()
+
+	@staticmethod
+	def CameraMask():
+		""" Camera mask of the movie camera, nodes that are hidden with the
+		mask of the window camera (bit 1) are still visible in the movie
+		"""
+		return BitMask32.bit(0)
+
+	def Capture(self,filename):
+		""" Queues the image of the last rendered frame to be saved
+
+		Input:
+		filename (str) name of the image file (the extension is replaced by .raw for the raw format)
+		"""
+		if self.tex.hasRamImage()==False: #nothing was rendered yet
+			return False
+		if self.format=='png':
+			image=PNMImage()
+			self.tex.store(image)
+		else:
+			image=bytes(self.tex.getRamImageAs('RGB'))
+			filename=filename.rsplit('.',1)[0]+'.raw'
+		self.queue.put((image,filename)) #blocks only if the threads are queuesize images behind
+		return True
+
+	def Worker(self):
+		while True:
+			item=self.queue.get()
+			if item is None:
+				self.queue.task_done()
+				break
+			image,filename=item
+			if self.format=='png':
+				image.write(Filename(filename))
+			else:
+				with open(filename,'wb') as f:
+					f.write(image)
+			self.queue.task_done()
+
+	def Close(self):
+		""" Waits until all images are saved and stops the threads
+		"""
+		for t in self.threads:
+			self.queue.put(None)
+		for t in self.threads:
+			t.join()
+		self.buffer.setActive(False)
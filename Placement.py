@@ -0,0 +1,130 @@
+import math
+import random
+
+class SpatialHash():
+	""" Points on the floor, sorted into square cells of the size of the minimum distance,
+	so that only the points of the 3x3 neighbouring cells have to be checked for a new point.
+	"""
+
+	def __init__(self,cellsize):
+		self.cellsize=cellsize
+		self.cells=dict()
+
+	def Cell(self,x,y):
+		return (int(math.floor(x/self.cellsize)),int(math.floor(y/self.cellsize)))
+
+	def Add(self,x,y):
+		key=self.Cell(x,y)
+		try:
+			self.cells[key].append((x,y))
+		except KeyError:
+			self.cells[key]=[(x,y)]
+
+	def Near(self,x,y):
+		""" Output:
+		(bool) True if a point is closer than the cell size to (x,y)
+		"""
+		cx,cy=self.Cell(x,y)
+		d2=self.cellsize**2
+		for i in (cx-1,cx,cx+1):
+			for j in (cy-1,cy,cy+1):
+				for px,py in self.cells.get((i,j),()):
+					if (px-x)**2+(py-y)**2<d2:
+						return True
+		return False
+
+class Placement():
+	""" Distributes the couples randomly on the ballroom floor, so that no dancer
+	is closer than mindistance to any other dancer.
+
+	Distributions of the leading partners:
+		'borders' - random place with preference close to the borders (the distribution of earlier versions)
+		'uniform' - uniformly distributed over the floor
+		'poisson' - Poisson-disk sampling, every new couple is placed close to (but not closer than mindistance to)
+					an already placed couple, which packs the floor densely and detects a full floor quickly
+	The following partner is placed in a random direction at the pair distance.
+
+	If a couple cannot be placed within maxattempts attempts, the floor is considered full
+	and a RuntimeError is raised.
+	"""
+
+	def __init__(self,ballroomsize,mindistance,distribution='borders',maxattempts=10000):
+		""" Input:
+		ballroomsize ([float,float]) length and width of the floor
+		mindistance (float) minimum distance between two dancers
+		distribution (str) 'borders', 'uniform' or 'poisson', see above
+		maxattempts (int) maximum number of attempts to place one couple
+		"""
+		if distribution not in ['borders','uniform','poisson']:
+			raise ValueError('unknown distribution: '+str(distribution))
+		self.a=ballroomsize[0]/2
+		self.b=ballroomsize[1]/2
+		self.mindistance=mindistance
+		self.distribution=distribution
+		self.maxattempts=maxattempts
+		self.points=SpatialHash(mindistance)
+		self.active=list() # couples with free space around them (poisson only)
+
+	def Place(self,pairdistances,onplaced=None):
+		""" Places all couples
+
+		Input:
+		pairdistances (list(float)) distance between the dancers of each couple
+		onplaced (function) called with (pos1,pos2,index) directly after each couple has been placed
+
+		Output:
+		positions (list(((float,float),(float,float)))) positions of the leading and the following partner of each couple
+		"""
+		positions=list()
+		for index,d1 in enumerate(pairdistances):
+			for attempt in range(self.maxattempts):
+				pos1,pos2=self.Candidate(d1)
+				if self.points.Near(*pos1)==False and self.points.Near(*pos2)==False: #both partners have enough space?
+					break
+			else:
+				raise RuntimeError('the ballroom is full: only '+str(index)+' of '+str(len(pairdistances))+' couples could be placed')
+			self.points.Add(*pos1)
+			self.points.Add(*pos2)
+			self.active.append(pos1)
+			positions.append((pos1,pos2))
+			if onplaced is not None:
+				onplaced(pos1,pos2,index)
+		return positions
+
+	def Candidate(self,d1):
+		""" Random position of a couple
+
+		Input:
+		d1 (float) distance between the dancers
+
+		Output:
+		pos1,pos2 ((float,float)) positions of the leading and the following partner
+		"""
+		if self.distribution=='borders':
+			r=[random.random()**(0.5)*self.a*(random.choice([-1,1])),random.random()**(0.5)*self.b*(random.choice([-1,1]))] #random place with preference close to the borders
+		elif self.distribution=='uniform' or len(self.active)==0:
+			r=[random.uniform(-self.a,self.a),random.uniform(-self.b,self.b)]
+		else:
+			r=self.PoissonCandidate()
+		angle=random.random()*360 #random angle
+		pos1=(r[0],r[1])
+		pos2=(r[0]-math.sin(angle)*d1,r[1]+math.cos(angle)*d1)
+		return pos1,pos2
+
+	def PoissonCandidate(self,tries=30):
+		""" Random position in the ring between one and two minimum distances around
+		an already placed couple. Couples around which no position was found in several
+		tries are not used any more.
+		"""
+		while len(self.active)>0:
+			i=random.randrange(len(self.active))
+			x,y=self.active[i]
+			for t in range(tries):
+				radius=self.mindistance*(1+random.random())
+				phi=random.random()*2*math.pi
+				r=[x+radius*math.cos(phi),y+radius*math.sin(phi)]
+				if abs(r[0])<=self.a and abs(r[1])<=self.b and self.points.Near(*r)==False:
+					return r
+			self.active[i]=self.active[-1]
+			self.active.pop()
+		return [random.uniform(-self.a,self.a),random.uniform(-self.b,self.b)]
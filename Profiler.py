@@ -0,0 +1,138 @@
+import json
+import time
+
+class NullProfiler():
+	""" Profiler that does nothing, used if the simulation is not profiled.
+	All methods are as cheap as possible, so the instrumentation can stay in the hot path.
+	"""
+	enabled=False
+
+	def Clock(self):
+		return 0.0
+
+	def Add(self,phase,start):
+		pass
+
+	def Count(self,name,n=1):
+		pass
+
+	def Set(self,name,value):
+		pass
+
+	def Beat(self):
+		pass
+
+	def Finish(self):
+		pass
+
+class Profiler():
+	""" Collects the time spent in the phases of the simulation, some counters and per-beat statistics.
+
+	A phase is measured by
+		start=profiler.Clock()
+		...
+		profiler.Add('phase',start)
+	For every phase the number of calls, the total and the maximum time and a histogram of the
+	times per call (bins of powers of two microseconds) are kept.
+	Beat closes the statistics of the current beat: the time of the phase 'step' (a whole time-step)
+	since the previous beat is stored per beat and sorted into a histogram of beat times as well.
+
+	At the end (Finish) a summary table is printed and, if a filename is given, all numbers
+	are saved as JSON file.
+	"""
+	enabled=True
+	BINS=32 #histogram bins: [0,2) us, [2,4) us, [4,8) us, ...
+
+	def __init__(self,filename=None):
+		""" Input:
+		filename (str) JSON file the statistics are saved to, None to only print the summary
+		"""
+		self.filename=filename
+		self.phases=dict() # phase -> [calls,total,maximum,histogram]
+		self.counters=dict()
+		self.beattimes=list() # time of all phases per beat (s)
+		self.beatframes=list() # number of frames per beat
+		self.beatstart=dict() # totals of the phases at the start of the current beat
+		self.created=time.perf_counter()
+
+	Clock=staticmethod(time.perf_counter)
+
+	def Add(self,phase,start):
+		""" Input:
+		phase (str) name of the phase
+		start (float) result of Clock at the start of the phase
+		"""
+		duration=time.perf_counter()-start
+		try:
+			stats=self.phases[phase]
+		except KeyError:
+			stats=self.phases[phase]=[0,0.0,0.0,[0]*self.BINS]
+		stats[0]+=1
+		stats[1]+=duration
+		if duration>stats[2]:
+			stats[2]=duration
+		stats[3][self.Bin(duration)]+=1
+
+	def Count(self,name,n=1):
+		self.counters[name]=self.counters.get(name,0)+n
+
+	def Set(self,name,value):
+		self.counters[name]=value
+
+	def Beat(self):
+		""" Closes the statistics of the current beat
+		"""
+		step=self.phases.get('step',[0,0.0])
+		before=self.beatstart.get('step',[0,0.0])
+		self.beattimes.append(step[1]-before[1])
+		self.beatframes.append(step[0]-before[0])
+		self.beatstart={'step':list(step[:2])}
+
+	@classmethod
+	def Bin(cls,duration):
+		""" Histogram bin of a duration (s), bins of powers of two microseconds
+		"""
+		return min(cls.BINS-1,max(0,int(duration*1e6).bit_length()-1))
+
+	@classmethod
+	def Histogram(cls,durations):
+		histogram=[0]*cls.BINS
+		for d in durations:
+			histogram[cls.Bin(d)]+=1
+		return histogram
+
+	def Results(self):
+		""" Output:
+		results (dict) all statistics (times in seconds)
+		"""
+		results=dict()
+		results['wall']=time.perf_counter()-self.created
+		results['phases']={phase:{'calls':s[0],'total':s[1],'mean':s[1]/s[0],'max':s[2],'histogram':list(s[3])} for phase,s in self.phases.items()}
+		results['counters']=dict(self.counters)
+		results['beats']={'times':list(self.beattimes),'frames':list(self.beatframes),'histogram':self.Histogram(self.beattimes)}
+		results['histogrambins']='bin k: [2**k,2**(k+1)) microseconds, bin 0 includes everything below 2 microseconds'
+		return results
+
+	def Summary(self):
+		""" Output:
+		(str) table of the phases and counters
+		"""
+		total=self.phases['step'][1] if 'step' in self.phases else sum([s[1] for s in self.phases.values()])
+		lines=['%-20s %10s %12s %12s %12s %7s'%('phase','calls','total [s]','mean [ms]','max [ms]','share')]
+		for phase,s in sorted(self.phases.items(),key=lambda x:-x[1][1]):
+			share=s[1]/total*100 if total>0 else 0
+			lines.append('%-20s %10d %12.3f %12.4f %12.4f %6.1f%%'%(phase,s[0],s[1],s[1]/s[0]*1e3,s[2]*1e3,share))
+		for name,value in sorted(self.counters.items()):
+			lines.append('%-20s %10d'%(name,value))
+		if len(self.beattimes)>0:
+			beattimes=sorted(self.beattimes)
+			lines.append('%-20s %10d %12s %12.4f %12.4f'%('time per beat',len(beattimes),'',sum(beattimes)/len(beattimes)*1e3,beattimes[-1]*1e3))
+		return '\n'.join(lines)
+
+	def Finish(self):
+		""" Prints the summary and saves the statistics (if a filename is given)
+		"""
+		print(self.Summary())
+		if self.filename is not None:
+			with open(self.filename,'w') as f:
+				json.dump(self.Results(),f,sort_keys=True)
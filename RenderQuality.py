@@ -0,0 +1,166 @@
+""" Level of detail of the couple models and a frame-time budget for large ballrooms.
+
+Every couple model (see ModelLibrary) is replaced by an LODNode with three levels:
+	the full model - close to the camera
+	a box - with the size of the model, at medium distance
+	a billboard - a card with the size of the model that always turns towards the camera, far away
+Since all couples share the prototype of their model, the LOD is computed per couple, but the
+switch distances of all couples are changed at once (LODNode.setLodScale).
+
+If a frame-time budget is given, the detail is lowered automatically while the frames take longer
+than the budget: first the switch distances shrink (down to MINSCALE), then the per-pixel lighting
+of the couples is switched off. The detail is raised again when the frames are fast enough.
+The mode can be switched while the simulation is running (see Controls): 'auto' (budget), 'high', 'low'.
+"""
+from panda3d.core import *
+
+MINSCALE=0.1 #smallest factor of the switch distances
+MODES=['auto','high','low']
+
+class RenderQuality():
+	""" LOD of the couple models and the frame-time budget (see above)
+	"""
+
+	def __init__(self,distances=(15.0,40.0),budget=None):
+		""" Input:
+		distances ((float,float)) camera distance (m) up to which the full model is drawn and up to which the box is drawn,
+					the billboard is drawn beyond
+		budget (float) frame time (s) the rendering should stay below, None for fixed detail
+		"""
+		self.distances=list(distances) #panda compares them with the distance in the scene, not in the scaled model
+		self.budget=budget
+		self.mode='auto' if budget is not None else 'high'
+		self.lods=list() # LODNodes of all prototypes
+		self.models=list() # prototypes of the full models
+		self.scale=1.0
+		self.shaders=True
+		self.frametime=None # smoothed frame time (s)
+
+	def LOD(self,model):
+		""" Wraps a model into an LODNode with the full model, a box and a billboard
+
+		Input:
+		model (NodePath) the full model (see ModelLibrary.Load)
+
+		Output:
+		(NodePath) the LODNode
+		"""
+		lod=LODNode('lod')
+		nodepath=NodePath(lod)
+		bounds=model.getTightBounds()
+		lod.addSwitch(self.distances[0],0)
+		model.reparentTo(nodepath)
+		lod.addSwitch(self.distances[1],self.distances[0])
+		Box(bounds[0],bounds[1]).reparentTo(nodepath)
+		lod.addSwitch(1e9,self.distances[1])
+		Billboard(bounds[0],bounds[1]).reparentTo(nodepath)
+		lod.setLodScale(self.scale)
+		self.lods.append(lod)
+		self.models.append(model)
+		return nodepath
+
+	def SetScale(self,scale):
+		""" Multiplies all switch distances by scale (<1 for less detail)
+		"""
+		self.scale=scale
+		for lod in self.lods:
+			lod.setLodScale(scale)
+
+	def SetShaders(self,shaders):
+		""" Switches the per-pixel lighting of the full models on or off
+		"""
+		self.shaders=shaders
+		for model in self.models:
+			if shaders==True:
+				model.setShaderAuto()
+			else:
+				model.setShaderOff()
+
+	def Update(self,frametime):
+		""" Adapts the detail to the frame-time budget, called once per rendered frame
+
+		Input:
+		frametime (float) duration of the last frame (s)
+		"""
+		if self.mode!='auto':
+			return
+		if self.frametime is None:
+			self.frametime=frametime
+		self.frametime=0.9*self.frametime+0.1*frametime
+		if self.frametime>self.budget*1.1:
+			if self.scale>MINSCALE:
+				self.SetScale(max(MINSCALE,self.scale*0.9))
+			elif self.shaders==True:
+				self.SetShaders(False)
+		elif self.frametime<self.budget*0.7:
+			if self.shaders==False:
+				self.SetShaders(True)
+			elif self.scale<1.0:
+				self.SetScale(min(1.0,self.scale/0.9))
+
+	def NextMode(self):
+		""" Switches to the next mode (see MODES)
+
+		Output:
+		(str) the new mode
+		"""
+		self.mode=MODES[(MODES.index(self.mode)+1)%len(MODES)]
+		if self.mode=='high':
+			self.SetScale(1.0)
+			self.SetShaders(True)
+		elif self.mode=='low':
+			self.SetScale(MINSCALE)
+			self.SetShaders(False)
+		elif self.budget is None:
+			self.mode=self.NextMode() #without budget, there is nothing to adapt
+		self.frametime=None
+		return self.mode
+
+def Box(pmin,pmax,color=(0.64,0.64,0.64,1)):
+	""" Box between the corners pmin and pmax (one geom with 12 triangles)
+	"""
+	data=GeomVertexData('box',GeomVertexFormat.getV3n3c4(),Geom.UHStatic)
+	vertex=GeomVertexWriter(data,'vertex')
+	normal=GeomVertexWriter(data,'normal')
+	colors=GeomVertexWriter(data,'color')
+	triangles=GeomTriangles(Geom.UHStatic)
+	corners=[pmin,pmax]
+	for axis in range(3):
+		for side in (0,1):
+			n=[0,0,0]
+			n[axis]=1 if side==1 else -1
+			u,v=[x for x in range(3) if x!=axis]
+			start=data.getNumRows()
+			for a,b in [(0,0),(1,0),(1,1),(0,1)]:
+				p=[0,0,0]
+				p[axis]=corners[side][axis]
+				p[u]=corners[a][u]
+				p[v]=corners[b][v]
+				vertex.addData3(*p)
+				normal.addData3(*n)
+				colors.addData4(*color)
+			if (side==1)==((axis==1)==False): #counter-clockwise seen from outside
+				triangles.addVertices(start,start+1,start+2)
+				triangles.addVertices(start,start+2,start+3)
+			else:
+				triangles.addVertices(start,start+2,start+1)
+				triangles.addVertices(start,start+3,start+2)
+	geom=Geom(data)
+	geom.addPrimitive(triangles)
+	node=GeomNode('box')
+	node.addGeom(geom)
+	return NodePath(node)
+
+def Billboard(pmin,pmax,color=(0.64,0.64,0.64,1)):
+	""" Vertical card with the size of the box between pmin and pmax, turning around the vertical axis towards the camera
+	"""
+	width=max(pmax[0]-pmin[0],pmax[1]-pmin[1])
+	card=CardMaker('billboard')
+	card.setFrame(-width*0.5,width*0.5,pmin[2],pmax[2])
+	card.setColor(*color)
+	holder=NodePath('billboard')
+	holder.setLightOff() #the card has no normals
+	holder.setPos((pmin[0]+pmax[0])*0.5,(pmin[1]+pmax[1])*0.5,0)
+	nodepath=holder.attachNewNode(card.generate()) #the card lies in the x-z plane
+	nodepath.setBillboardAxis()
+	return holder
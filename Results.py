@@ -0,0 +1,144 @@
+""" Results of the simulations in a SQLite database.
+
+Every simulation is one row of the table runs (scenario name, seed, music file, number of couples,
+frames, simulated time, setup and run time and all parameters of the scenario as JSON), the collisions
+are stored per identifier in the table collisions, the contact episodes (if tracked, see ContactEpisodes)
+per identifier in the table episodes. The database uses write-ahead logging (WAL),
+so many processes can add their results to the same file at the same time, and the results are
+written in batches of several runs per transaction.
+
+The results can be exported as ;-separated table with one row per run and one column per identifier, e.g.
+python Results.py Results/Results.sqlite Results/Results.csv
+"""
+import csv
+import json
+import sqlite3
+import sys
+import time
+
+SCHEMA='''
+CREATE TABLE IF NOT EXISTS runs (
+	id INTEGER PRIMARY KEY,
+	created TEXT,
+	scenarioname TEXT,
+	seed INTEGER,
+	musicfile TEXT,
+	couples INTEGER,
+	frames INTEGER,
+	time REAL,
+	setup REAL,
+	runtime REAL,
+	parameters TEXT
+);
+CREATE TABLE IF NOT EXISTS collisions (
+	run INTEGER REFERENCES runs(id),
+	identifier TEXT,
+	couples INTEGER,
+	collisions REAL
+);
+CREATE INDEX IF NOT EXISTS collisionsrun ON collisions(run);
+CREATE TABLE IF NOT EXISTS episodes (
+	run INTEGER REFERENCES runs(id),
+	identifier TEXT,
+	episodes REAL,
+	duration REAL,
+	impactspeed REAL
+);
+CREATE INDEX IF NOT EXISTS episodesrun ON episodes(run);
+'''
+
+class ResultStore():
+	""" Database of simulation results (see above)
+	"""
+
+	def __init__(self,filename='Results/Results.sqlite',batchsize=1):
+		""" Input:
+		filename (str) SQLite file, created if it does not exist
+		batchsize (int) number of runs that are collected before they are written in one transaction
+		"""
+		self.filename=filename
+		self.batchsize=batchsize
+		self.pending=list()
+		self.connection=sqlite3.connect(filename,timeout=60) #waits for other processes that are writing
+		self.connection.execute('PRAGMA journal_mode=WAL')
+		self.connection.execute('PRAGMA synchronous=NORMAL')
+		with self.connection:
+			self.connection.executescript(SCHEMA)
+
+	def Add(self,results,parameters=None):
+		""" Adds the results of one simulation
+
+		Input:
+		results (dict) see DanceClass.Simulation.finalStuff
+		parameters (dict) parameters of the scenario (e.g. the specification of Scenario.RunScenario),
+					the keys 'seed' and 'musicfile' are also stored in their own columns
+		"""
+		if parameters is None:
+			parameters=dict()
+		self.pending.append((time.strftime('%Y-%m-%d %H:%M:%S'),results,parameters))
+		if len(self.pending)>=self.batchsize:
+			self.Flush()
+
+	def Flush(self):
+		""" Writes all pending runs in one transaction
+		"""
+		if len(self.pending)==0:
+			return
+		with self.connection:
+			for created,results,parameters in self.pending:
+				cursor=self.connection.execute('INSERT INTO runs (created,scenarioname,seed,musicfile,couples,frames,time,setup,runtime,parameters) VALUES (?,?,?,?,?,?,?,?,?,?)',
+					(created,str(results.get('scenarioname')),parameters.get('seed'),parameters.get('musicfile'),
+					sum(results.get('couples',dict()).values()),results.get('frames'),results.get('time'),results.get('setup'),results.get('runtime'),
+					json.dumps(parameters,sort_keys=True,default=str)))
+				run=cursor.lastrowid
+				self.connection.executemany('INSERT INTO collisions (run,identifier,couples,collisions) VALUES (?,?,?,?)',
+					[(run,identifier,results.get('couples',dict()).get(identifier),value) for identifier,value in sorted(results['collisions'].items())])
+				self.connection.executemany('INSERT INTO episodes (run,identifier,episodes,duration,impactspeed) VALUES (?,?,?,?,?)',
+					[(run,identifier,x['episodes'],x['duration'],x['impactspeed']) for identifier,x in sorted(results.get('episodes',dict()).items())])
+		self.pending=list()
+
+	def Close(self):
+		self.Flush()
+		self.connection.close()
+
+	def Identifiers(self,table='collisions'):
+		""" Output:
+		(list(str)) all identifiers that occur in the collisions (or in the episodes)
+		"""
+		return [x[0] for x in self.connection.execute('SELECT DISTINCT identifier FROM '+table+' ORDER BY identifier')]
+
+	def Rows(self):
+		""" Output:
+		rows (list(dict)) one row per run with the collisions per identifier as columns
+					(and the episodes as columns identifier_episodes, identifier_duration, identifier_impactspeed)
+		"""
+		self.Flush()
+		collisions=dict()
+		for run,identifier,value in self.connection.execute('SELECT run,identifier,collisions FROM collisions'):
+			collisions.setdefault(run,dict())[identifier]=value
+		for run,identifier,episodes,duration,impactspeed in self.connection.execute('SELECT run,identifier,episodes,duration,impactspeed FROM episodes'):
+			collisions.setdefault(run,dict()).update({identifier+'_episodes':episodes,identifier+'_duration':duration,identifier+'_impactspeed':impactspeed})
+		rows=list()
+		for run,created,scenarioname,seed,musicfile,couples,frames,simtime,setup,runtime in self.connection.execute(
+				'SELECT id,created,scenarioname,seed,musicfile,couples,frames,time,setup,runtime FROM runs ORDER BY id'):
+			row={'run':run,'created':created,'scenarioname':scenarioname,'seed':seed,'musicfile':musicfile,'couples':couples,
+				'frames':frames,'time':simtime,'setup':setup,'runtime':runtime}
+			row.update(collisions.get(run,dict()))
+			rows.append(row)
+		return rows
+
+	def ExportCSV(self,csvfilename):
+		""" Writes all runs into a ;-separated table with header
+		"""
+		fields=['run','created','scenarioname','seed','musicfile','couples','frames','time','setup','runtime']+self.Identifiers()
+		for identifier in self.Identifiers('episodes'):
+			fields+=[identifier+'_episodes',identifier+'_duration',identifier+'_impactspeed']
+		with open(csvfilename,'w',newline='') as f:
+			writer=csv.DictWriter(f,fieldnames=fields,delimiter=';',restval='')
+			writer.writeheader()
+			writer.writerows(self.Rows())
+
+if __name__=='__main__':
+	store=ResultStore(sys.argv[1])
+	store.ExportCSV(sys.argv[2])
+	store.Close()
@@ -0,0 +1,67 @@
+import heapq
+import bisect
+from collections import deque
+
+class RunningMedian():
+	""" Median of a stream of numbers that is updated with every new value
+	instead of being recalculated from the whole history.
+
+	Without a window, all values are kept in two heaps (the lower half in a
+	max-heap, the upper half in a min-heap), so adding a value costs O(log n)
+	and the median is read off the tops of the heaps.
+	With a window, only the last values are kept in a sorted list, so the
+	memory is bounded and the median follows the recent behaviour.
+
+	The median of an even number of values is the mean of the two middle
+	values (as for statistics.median).
+	"""
+
+	def __init__(self,window=None):
+		""" Input:
+		window (int) number of most recent values the median is taken over, None to use all values
+		"""
+		self.window=window
+		if self.window is None:
+			self.__lower=list() # max-heap (negated values) of the lower half
+			self.__upper=list() # min-heap of the upper half
+		else:
+			self.__values=deque()
+			self.__sorted=list()
+
+	def Add(self,value):
+		if self.window is None:
+			if len(self.__lower)==0 or value<=-self.__lower[0]:
+				heapq.heappush(self.__lower,-value)
+			else:
+				heapq.heappush(self.__upper,value)
+			#rebalance: the lower half contains as many or one more value than the upper half
+			if len(self.__lower)>len(self.__upper)+1:
+				heapq.heappush(self.__upper,-heapq.heappop(self.__lower))
+			elif len(self.__upper)>len(self.__lower):
+				heapq.heappush(self.__lower,-heapq.heappop(self.__upper))
+		else:
+			self.__values.append(value)
+			bisect.insort(self.__sorted,value)
+			if len(self.__values)>self.window:
+				old=self.__values.popleft()
+				del self.__sorted[bisect.bisect_left(self.__sorted,old)]
+
+	def Median(self):
+		""" Output:
+		(float) median of the values (of the window)
+		"""
+		if len(self)==0:
+			raise ValueError('no median for empty data')
+		if self.window is None:
+			if len(self.__lower)>len(self.__upper):
+				return -self.__lower[0]
+			return (-self.__lower[0]+self.__upper[0])/2
+		n=len(self.__sorted)
+		if n%2==1:
+			return self.__sorted[n//2]
+		return (self.__sorted[n//2-1]+self.__sorted[n//2])/2
+
+	def __len__(self):
+		if self.window is None:
+			return len(self.__lower)+len(self.__upper)
+		return len(self.__values)
@@ -0,0 +1,128 @@
+import random
+
+import BeatLibrary
+
+OPTIONS=['planar','collisionmode','telemetry'] #keys of a scenario specification that are passed to the simulation
+
+def LoadBeats(musicfile):
+	""" Reads the time-instants of the music beats
+	(parsed only once and cached, see BeatLibrary)
+
+	Input:
+	musicfile (str) csv file, containing the time-instants (seconds) for the music beats in the first column
+
+	Output:
+	beats (list(float)) time-instants of the beats
+	"""
+	return BeatLibrary.Load(musicfile).Beats()
+
+def MakeDancers(totaldancers,slowshare=0.0,distantshare=0.0,awfulshare=0.0,e360=240.0,dgood=0.5,factor=0.9,initialfactor=0.5,mass=150.0):
+	""" Creates the list of couples that is passed to the simulation
+
+	Input:
+	totaldancers (int) number of couples
+	slowshare (float) share of couples with reduced max-energy
+	distantshare (float) share of couples with larger distance beteen rotation axes
+	awfulshare (float) share of couples with both penalties
+	e360 (float) [J] max kinetic energy for good dancers
+	dgood (float) distance between bodies
+	factor (float) penalty factor for worse dancers
+	initialfactor (float) initialfactor*e360= energy used for the first spin
+	mass (float) mass of a couple
+
+	Output:
+	Dancers (list(dict)) specification of the couples
+	"""
+	slowdancers=int(totaldancers*slowshare) #couples with reduced max-energy
+	distantdancers=int(totaldancers*distantshare) #couples with larger distance beteen rotation axes
+	awfuldancers=int(totaldancers*awfulshare) #couples with both penalties
+	perfectdancers=totaldancers-slowdancers-distantdancers-awfuldancers #perfect skilled agents
+
+	Dancers=list()
+	for i in range(perfectdancers):
+		Dancers.append(MakeDancer(e360,True,dgood,initialfactor,'CoupleGood.egg',mass,'perfect'))
+	for i in range(perfectdancers):
+		Dancers.append(MakeDancer(e360,False,dgood,initialfactor,'CoupleGood.egg',mass,'perfect'))
+	for i in range(slowdancers):
+		Dancers.append(MakeDancer(e360*factor,False,dgood,initialfactor,'CoupleSlow.egg',mass,'slow'))
+	for i in range(distantdancers):
+		Dancers.append(MakeDancer(e360,False,dgood/(factor**0.5),initialfactor,'CoupleDistant.egg',mass,'distant'))
+	for i in range(awfuldancers):
+		Dancers.append(MakeDancer(e360*factor,False,dgood/(factor**0.5),initialfactor,'CoupleAwful.egg',mass,'awful'))
+	return Dancers
+
+def MakeDancer(maxenergy,leftdancer,pairdistance,initialfactor,modelname,mass,identifier):
+	d={}
+	d['maxenergy']=maxenergy
+	d['leftdancer']=leftdancer
+	d['pairdistance']=pairdistance
+	d['initialenergy']=d['maxenergy']*initialfactor
+	d['modelname']=modelname
+	d['mass']=mass
+	d['identifier']=identifier
+	return d
+
+def SpecDancers(spec):
+	""" Creates the couples of a scenario specification (see RunScenario)
+	"""
+	keys=['slowshare','distantshare','awfulshare','e360','dgood','factor','initialfactor','mass']
+	return MakeDancers(spec['totaldancers'],**{k:spec[k] for k in keys if k in spec})
+
+def SpecOptions(spec):
+	""" Options of the simulation of a scenario specification (see OPTIONS)
+	"""
+	return {k:spec[k] for k in OPTIONS if k in spec}
+
+def RunScenario(spec):
+	""" Runs one headless simulation for a scenario specification.
+	The random generator is seeded before the couples are placed, so
+	the same specification always gives the same result.
+
+	Input:
+	spec (dict) scenario specification with the keys
+		'scenarioname', 'seed', 'musicfile', 'totaldancers' and optionally
+		'slowshare', 'distantshare', 'awfulshare', 'factor', 'e360', 'dgood', 'initialfactor', 'mass', 'tend',
+		'planar', 'collisionmode', 'telemetry' (see DanceClass.Simulation)
+
+	Output:
+	results (dict) results of the simulation (see DanceClass.Simulation.finalStuff) together with the specification
+	"""
+	import DanceClass
+
+	random.seed(spec['seed'])
+	Dancers=SpecDancers(spec)
+	beats=BeatLibrary.Load(spec['musicfile']) #the track, so its beat frames are reused by the following runs
+
+	DC=DanceClass.Simulation(Dancers,beats,spec.get('tend'),False,False,0,**SpecOptions(spec))
+	results=DC.Run(spec['scenarioname'],None,spec.get('tracefilename'))
+	results['spec']=spec
+	return results
+
+def BatchKey(spec):
+	""" Scenarios with the same key can be simulated together (see RunScenarioBatch)
+	"""
+	return (spec['musicfile'],spec.get('tend'))+tuple(sorted(SpecOptions(spec).items()))
+
+def RunScenarioBatch(specs):
+	""" Runs several scenarios with the same music file, end time and options together in one
+	headless simulation (see BatchSimulation). Every scenario gives the same result as RunScenario,
+	the traces of the scenarios are not saved.
+
+	Input:
+	specs (list(dict)) scenario specifications (see RunScenario)
+
+	Output:
+	results (list(dict)) results of every scenario (see RunScenario)
+	"""
+	from BatchSimulation import BatchSimulation
+
+	if len(set([BatchKey(spec) for spec in specs]))>1:
+		raise ValueError('the scenarios of a batch must have the same music file, end time and options')
+	ballrooms=[{'pairs':SpecDancers(spec),'seed':spec['seed'],'scenarioname':spec['scenarioname']} for spec in specs]
+	beats=BeatLibrary.Load(specs[0]['musicfile'])
+
+	DC=BatchSimulation(ballrooms,beats,specs[0].get('tend'),**SpecOptions(specs[0]))
+	batch=DC.Run()
+	for results,spec in zip(batch,specs):
+		results['spec']=spec
+	return batch
@@ -0,0 +1,130 @@
+""" Runs a grid of dance scenarios in parallel.
+
+Every scenario is a headless simulation (see Scenario.RunScenario). The scenarios
+are distributed over a pool of worker processes, every worker runs one scenario
+after the other, so the interpreter and panda3d are only started once per worker.
+The results are added to a SQLite database (see Results.ResultStore) as soon as
+they arrive, in batches of several runs per transaction. The database can be
+exported as ;-separated table with Results.py.
+
+With --ballrooms K, every worker simulates K scenarios (with the same music file)
+together in one simulation (see BatchSimulation), which is faster for small scenarios
+and gives the same results.
+
+Example:
+python Sweep.py --totaldancers 10 20 30 --slowshare 0.0 0.2 --seeds 5 --processes 4
+python Sweep.py --totaldancers 10 20 --seeds 50 --ballrooms 8
+"""
+import argparse
+import itertools
+import multiprocessing
+
+from Results import ResultStore
+import Scenario
+
+IDENTIFIERS=['perfect','slow','distant','awful']
+PARAMETERS=['totaldancers','slowshare','distantshare','awfulshare','factor','musicfile']
+
+def MakeGrid(seeds=1,baseseed=12345,**parameters):
+	""" Creates the scenario specifications for all combinations of parameters
+
+	Input:
+	seeds (int) number of random seeds (repetitions) per parameter combination
+	baseseed (int) seed of the first run, run number i gets the seed baseseed+i
+	parameters (list) values for each parameter of Scenario.RunScenario, e.g. totaldancers=[10,20]
+
+	Output:
+	specs (list(dict)) scenario specifications
+	"""
+	names=list(parameters.keys())
+	specs=list()
+	for values in itertools.product(*[parameters[x] for x in names]):
+		for repetition in range(seeds):
+			spec=dict(zip(names,values))
+			spec['seed']=baseseed+len(specs)
+			spec['scenarioname']='_'.join([str(x) for x in values])+'_'+str(repetition)
+			specs.append(spec)
+	return specs
+
+def MakeBatches(specs,ballrooms):
+	""" Groups the scenarios into batches of up to ballrooms scenarios with the same music file, end time and options
+	(see Scenario.RunScenarioBatch)
+	"""
+	groups=dict()
+	for spec in specs:
+		groups.setdefault(Scenario.BatchKey(spec),list()).append(spec)
+	batches=list()
+	for group in groups.values():
+		for start in range(0,len(group),ballrooms):
+			batches.append(group[start:start+ballrooms])
+	return batches
+
+def ResultRow(results):
+	""" Flattens the results of one scenario into a row of the result table
+	"""
+	spec=results['spec']
+	row={'scenarioname':spec['scenarioname'],'seed':spec['seed']}
+	for p in PARAMETERS:
+		row[p]=spec.get(p,'')
+	row['frames']=results['frames']
+	for identifier in IDENTIFIERS:
+		row[identifier]=results['collisions'].get(identifier,'')
+	return row
+
+def RunSweep(specs,processes=None,resultfilename='Results/Sweep.sqlite',batchsize=20,ballrooms=1):
+	""" Runs all scenarios on a pool of worker processes
+
+	Input:
+	specs (list(dict)) scenario specifications (see MakeGrid)
+	processes (int) number of worker processes, None to use all cores
+	resultfilename (str) SQLite file the results are added to (see Results.ResultStore)
+	batchsize (int) number of results that are written together
+	ballrooms (int) number of scenarios that are simulated together (see MakeBatches)
+
+	Output:
+	rows (list(dict)) one row per scenario, in the order the scenarios finished
+	"""
+	rows=list()
+	store=ResultStore(resultfilename,batchsize)
+	try:
+		with multiprocessing.Pool(processes) as pool:
+			if ballrooms>1:
+				batches=pool.imap_unordered(Scenario.RunScenarioBatch,MakeBatches(specs,ballrooms))
+			else:
+				batches=([x] for x in pool.imap_unordered(Scenario.RunScenario,specs))
+			for batch in batches:
+				for results in batch:
+					store.Add(results,results['spec'])
+					rows.append(ResultRow(results))
+	finally:
+		store.Close() #results are kept even if the sweep is interrupted
+	return rows
+
+if __name__=='__main__':
+	parser=argparse.ArgumentParser(description='Run a grid of dance scenarios on a process pool')
+	parser.add_argument('--totaldancers',type=int,nargs='+',default=[30])
+	parser.add_argument('--slowshare',type=float,nargs='+',default=[0.0])
+	parser.add_argument('--distantshare',type=float,nargs='+',default=[0.0])
+	parser.add_argument('--awfulshare',type=float,nargs='+',default=[0.0])
+	parser.add_argument('--factor',type=float,nargs='+',default=[0.9])
+	parser.add_argument('--musicfile',nargs='+',default=['Music/waltz_nr2.csv'])
+	parser.add_argument('--seeds',type=int,default=1,help='number of random seeds per parameter combination')
+	parser.add_argument('--baseseed',type=int,default=12345)
+	parser.add_argument('--processes',type=int,default=None)
+	parser.add_argument('--output',default='Results/Sweep.sqlite')
+	parser.add_argument('--planar',action='store_true',help='couples only move in the plane of the floor (see DanceClass.Simulation)')
+	parser.add_argument('--collisionmode',default='frames',choices=['frames','episodes','both'],help='see DanceClass.Simulation')
+	parser.add_argument('--telemetry',default=None,help='send live summaries of every beat, e.g. udp:9999 (see Telemetry)')
+	parser.add_argument('--ballrooms',type=int,default=1,help='number of scenarios simulated together per process')
+	args=parser.parse_args()
+
+	specs=MakeGrid(args.seeds,args.baseseed,totaldancers=args.totaldancers,slowshare=args.slowshare,distantshare=args.distantshare,
+		awfulshare=args.awfulshare,factor=args.factor,musicfile=args.musicfile)
+	for spec in specs:
+		if args.planar==True:
+			spec['planar']=True
+		if args.collisionmode!='frames':
+			spec['collisionmode']=args.collisionmode
+		if args.telemetry is not None:
+			spec['telemetry']=args.telemetry
+	RunSweep(specs,args.processes,args.output,ballrooms=args.ballrooms)
@@ -0,0 +1,130 @@
+""" Live telemetry of running simulations.
+
+A simulation with telemetry sends a summary after every beat (simulated time, mean wall time per
+time-step, collisions per identifier, mean energy of the couples, number of couples that switched
+their direction) and a last record with the results. The records are put into a bounded queue and
+written by a background thread, so the simulation never waits for a slow consumer: if the queue is
+full, the record is dropped (and counted).
+
+Targets:
+	'udp:PORT' - JSON datagrams to 127.0.0.1:PORT, many simulations can send to the same client
+	any other string - file the records are appended to, one JSON object per line
+
+The client prints the records of several runs as they arrive, either from a port or by following files:
+python Telemetry.py --listen 9999
+python Telemetry.py Results/Telemetry*.jsonl
+"""
+import argparse
+import json
+import os
+import queue
+import socket
+import threading
+import time
+
+class Telemetry():
+	""" Sends telemetry records of one simulation to a file or a local port (see above)
+	"""
+
+	def __init__(self,target,maxsize=1000):
+		""" Input:
+		target (str) 'udp:PORT' or a file name
+		maxsize (int) number of records that can wait in the queue, further records are dropped
+		"""
+		self.target=target
+		self.queue=queue.Queue(maxsize)
+		self.dropped=0
+		self.thread=threading.Thread(target=self.Sink,daemon=True) #never keeps the interpreter alive
+		self.thread.start()
+
+	def Push(self,record):
+		""" Queues a record without waiting (dropped if the queue is full)
+
+		Input:
+		record (dict) JSON-serialisable record
+		"""
+		try:
+			self.queue.put_nowait(record)
+		except queue.Full:
+			self.dropped+=1
+
+	def Sink(self):
+		""" Writes the queued records until Close (runs in the background thread)
+		"""
+		if self.target.startswith('udp:'):
+			connection=socket.socket(socket.AF_INET,socket.SOCK_DGRAM)
+			address=('127.0.0.1',int(self.target[len('udp:'):]))
+			def Write(line):
+				try:
+					connection.sendto(line.encode(),address)
+				except OSError:
+					pass #nobody is listening
+		else:
+			connection=open(self.target,'a')
+			def Write(line):
+				connection.write(line+'\n')
+				connection.flush()
+		while True:
+			record=self.queue.get()
+			if record is None:
+				break
+			Write(json.dumps(record,default=str))
+		connection.close()
+
+	def Close(self,timeout=5.0):
+		""" Sends the remaining records and stops the background thread (waits at most timeout seconds)
+		"""
+		try:
+			self.queue.put(None,timeout=timeout)
+		except queue.Full:
+			return
+		self.thread.join(timeout)
+
+def Format(record):
+	""" One line of the client for a record
+	"""
+	collisions=' '.join(['%s %.1f'%(k,v) for k,v in sorted(record.get('collisions',dict()).items())])
+	if record.get('type')=='end':
+		return '%-24s finished  %7.1f s  %s'%(record['run'],record['time'],collisions)
+	return '%-24s beat %4d  %7.1f s  %6.2f ms/step  energy %6.1f  switches %3d  %s'%(record['run'],record['beat'],record['time'],
+		record['steptime']*1000,record['energy'],record['switches'],collisions)
+
+def Listen(port):
+	""" Prints the records sent to a local port (see above) until interrupted
+	"""
+	connection=socket.socket(socket.AF_INET,socket.SOCK_DGRAM)
+	connection.bind(('127.0.0.1',port))
+	while True:
+		data,address=connection.recvfrom(65536)
+		print(Format(json.loads(data.decode())),flush=True)
+
+def Follow(filenames,interval=0.5):
+	""" Prints the records of telemetry files as they are written (like tail -f) until interrupted
+	"""
+	files=dict()
+	pending=dict() #incomplete last line of every file (it may still be written)
+	while True:
+		for filename in filenames:
+			if filename not in files and os.path.exists(filename):
+				files[filename]=open(filename)
+				pending[filename]=''
+		for filename,f in files.items():
+			lines=(pending[filename]+f.read()).split('\n')
+			pending[filename]=lines.pop()
+			for line in lines:
+				if line!='':
+					print(Format(json.loads(line)),flush=True)
+		time.sleep(interval)
+
+if __name__=='__main__':
+	parser=argparse.ArgumentParser(description='Show the telemetry of running simulations')
+	parser.add_argument('filenames',nargs='*',help='telemetry files to follow')
+	parser.add_argument('--listen',type=int,default=None,help='local UDP port the simulations send to (telemetry udp:PORT)')
+	args=parser.parse_args()
+	try:
+		if args.listen is not None:
+			Listen(args.listen)
+		else:
+			Follow(args.filenames)
+	except KeyboardInterrupt:
+		pass
@@ -0,0 +1,201 @@
+""" Metrics of the traces of the dance couples.
+
+The trace files (see TraceFile) are opened memory-mapped and processed in chunks of beats,
+so only a few beats of a run are in memory at a time and thousands of runs can be analysed
+one after the other (or on several processes). Traces in the JSON format of earlier versions
+can be read as well, but have to be loaded completely.
+
+Metrics per run (all couples are evaluated at once):
+	pathlength - distance the rotation axis travelled (m), mean over the couples
+	coverage - angle (degree) the couples travelled around the centre of the floor, measured on the
+				ellipse of the floor (an angle of 360 is one lap), mean over the couples
+	spinangle - angle danced per spin (degree, measured as right spin), mean and standard deviation over all couples and beats
+	lanedeviation - angle (degree) between the direction a couple moved and the direction of the
+				guidance field (see GuidanceField) at its position, mean of the absolute values
+	closeapproaches - number of pairs of couples whose rotation axes were closer than a distance at a beat,
+				in total and per beat
+
+Example:
+python TraceAnalysis.py Results/*.npy --output Results/TraceMetrics.csv
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+
+import numpy as np
+
+from Collisions import CollisionGrid
+import GuidanceField
+import TraceFile
+
+METRICS=['beats','couples','pathlength','coverage','spinangle','spinanglestd','lanedeviation','closeapproaches','closeapproachesperbeat']
+
+def Open(filename):
+	""" Opens a trace file
+
+	Input:
+	filename (str) .npy trace file (memory-mapped) or .json trace file of earlier versions
+
+	Output:
+	(numpy.array beats x couples x 2) the traces
+	"""
+	if filename.endswith('.json'):
+		with open(filename) as f:
+			Q=json.load(f)
+		Q.sort(key=lambda x:x['index'])
+		if len(Q)==0:
+			return np.zeros((0,0,2),dtype=np.float32)
+		return np.array([x['coordinates'] for x in Q],dtype=np.float32).transpose(1,0,2)
+	return TraceFile.LoadTraces(filename,mmap=True)
+
+def Angles(v1,v2):
+	""" Signed angle (degree) from v1 to v2, for arrays of 2D vectors (... x 2)
+	"""
+	cross=v1[...,0]*v2[...,1]-v1[...,1]*v2[...,0]
+	dot=v1[...,0]*v2[...,0]+v1[...,1]*v2[...,1]
+	return np.degrees(np.arctan2(cross,dot))
+
+class TraceMetrics():
+	""" Accumulates the metrics of one run, chunk by chunk (see Add)
+	"""
+
+	def __init__(self,ncouples,ballroomsize=(40.0,20.0),field=None,closedistance=1.5):
+		""" Input:
+		ncouples (int) number of couples
+		ballroomsize ((float,float)) length and width of the floor
+		field (callable) guidance field for the lane deviation, None for the field of the simulation ('ellipsesq')
+		closedistance (float) distance of the rotation axes (m) below which two couples count as close approach
+		"""
+		self.ncouples=ncouples
+		self.adb=ballroomsize[0]/ballroomsize[1]
+		self.field=GuidanceField.MakeField('ellipsesq',ballroomsize) if field is None else field
+		self.grid=CollisionGrid(closedistance)
+		self.beats=0
+		self.pathlength=np.zeros(ncouples)
+		self.coverage=np.zeros(ncouples)
+		self.spins=0
+		self.spinsum=0.0
+		self.spinsquares=0.0
+		self.deviations=0
+		self.deviationsum=0.0
+		self.closeapproaches=0
+		self.previous=None # last two beats of the previous chunk
+
+	def Add(self,chunk):
+		""" Adds the next beats of the run
+
+		Input:
+		chunk (numpy.array beats x couples x 2) positions of the rotation axes
+		"""
+		chunk=np.asarray(chunk,dtype=float)
+		for positions in chunk:
+			self.closeapproaches+=len(self.grid.CandidatePairs(positions.tolist()))
+		self.beats+=len(chunk)
+		overlap=0
+		if self.previous is not None:
+			overlap=len(self.previous)
+			chunk=np.concatenate([self.previous,chunk]) #continue the metrics over the chunk borders
+		self.previous=chunk[-2:]
+
+		moves=chunk[max(0,overlap-1):] #every step between two beats is counted once
+		if len(moves)>=2:
+			steps=np.diff(moves,axis=0)
+			self.pathlength+=np.hypot(steps[...,0],steps[...,1]).sum(axis=0)
+
+			polar=np.arctan2(moves[...,1]*self.adb,moves[...,0]) #angle around the centre on the ellipse of the floor
+			self.coverage+=np.degrees(np.diff(np.unwrap(polar,axis=0),axis=0)).sum(axis=0)
+
+			target=self.field(moves[:-1].reshape(-1,2))[:,:2].reshape(steps.shape)
+			moved=np.hypot(steps[...,0],steps[...,1])>0
+			deviation=np.abs(Angles(target,steps))[moved]
+			self.deviations+=deviation.size
+			self.deviationsum+=deviation.sum()
+
+		if len(chunk)>=3: #at most two beats of the previous chunk, so every spin is new
+			#angle of a spin, measured as right spin (as in DanceClass.Simulation.CalculateEnergyVectorfield)
+			spins=180.0-Angles(chunk[1:-1]-chunk[:-2],chunk[2:]-chunk[1:-1])
+			spins=spins[np.isfinite(spins)]
+			self.spins+=spins.size
+			self.spinsum+=spins.sum()
+			self.spinsquares+=(spins**2).sum()
+
+	def Results(self):
+		""" Output:
+		(dict) the metrics (see above)
+		"""
+		results={'beats':self.beats,'couples':self.ncouples}
+		results['pathlength']=float(self.pathlength.mean()) if self.ncouples>0 else 0.0
+		results['coverage']=float(self.coverage.mean()) if self.ncouples>0 else 0.0
+		mean=self.spinsum/self.spins if self.spins>0 else float('nan')
+		results['spinangle']=mean
+		results['spinanglestd']=max(0.0,self.spinsquares/self.spins-mean**2)**0.5 if self.spins>0 else float('nan')
+		results['lanedeviation']=self.deviationsum/self.deviations if self.deviations>0 else float('nan')
+		results['closeapproaches']=self.closeapproaches
+		results['closeapproachesperbeat']=self.closeapproaches/self.beats if self.beats>0 else 0.0
+		return results
+
+def Analyse(filename,ballroomsize=(40.0,20.0),closedistance=1.5,chunk=256):
+	""" Computes the metrics of one trace file
+
+	Input:
+	filename (str) trace file (.npy or .json)
+	ballroomsize ((float,float)) length and width of the floor the run was simulated on
+	closedistance (float) see TraceMetrics
+	chunk (int) number of beats that are processed at once
+
+	Output:
+	results (dict) the metrics (see above) and the filename
+	"""
+	trace=Open(filename)
+	metrics=TraceMetrics(trace.shape[1],ballroomsize,None,closedistance)
+	for start in range(0,trace.shape[0],chunk):
+		metrics.Add(trace[start:start+chunk])
+	results=metrics.Results()
+	results['filename']=filename
+	return results
+
+def AnalyseMany(filenames,processes=1,**options):
+	""" Computes the metrics of many trace files, one file after the other on each process
+
+	Input:
+	filenames (list(str)) trace files
+	processes (int) number of worker processes, 1 to run in the current process, None to use all cores
+	options see Analyse
+
+	Output:
+	(generator(dict)) the results of every file, in the order of the files
+	"""
+	arguments=[(filename,options) for filename in filenames]
+	if processes==1:
+		for x in arguments:
+			yield _Analyse(x)
+	else:
+		with multiprocessing.Pool(processes) as pool:
+			for results in pool.imap(_Analyse,arguments):
+				yield results
+
+def _Analyse(arguments):
+	filename,options=arguments
+	return Analyse(filename,**options)
+
+if __name__=='__main__':
+	parser=argparse.ArgumentParser(description='Compute metrics of trace files')
+	parser.add_argument('filenames',nargs='+')
+	parser.add_argument('--ballroomsize',type=float,nargs=2,default=[40.0,20.0])
+	parser.add_argument('--closedistance',type=float,default=1.5)
+	parser.add_argument('--processes',type=int,default=1)
+	parser.add_argument('--output',default=None,help=';-separated table of the metrics, printed if not given')
+	args=parser.parse_args()
+
+	rows=AnalyseMany(args.filenames,args.processes,ballroomsize=args.ballroomsize,closedistance=args.closedistance)
+	if args.output is None:
+		for row in rows:
+			print(row)
+	else:
+		with open(args.output,'w',newline='') as f:
+			writer=csv.DictWriter(f,fieldnames=['filename']+METRICS,delimiter=';')
+			writer.writeheader()
+			for row in rows:
+				writer.writerow(row)
+				f.flush()
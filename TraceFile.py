@@ -0,0 +1,96 @@
+""" Binary trace files of the dance couples.
+
+A trace file is a NumPy .npy file holding a float32 array of shape
+(beats x couples x 2) with the x/y position of the rotation axis of every
+couple at every spin. The file is created with its final size when the
+simulation starts and every spin is written into it as soon as it happens,
+so a simulation that dies still leaves all spins up to that point.
+Rows that were not reached yet are NaN. The number of written spins is kept
+in a small text file next to the trace file (<filename>.length), which is
+updated after every spin.
+
+Trace files can be opened memory-mapped (LoadTraces), i.e. without reading
+them into memory, and can be converted into the JSON format of earlier
+versions (ToJSON), e.g.
+python TraceFile.py Results/Traces.npy Results/Traces.json
+"""
+import json
+import sys
+
+import numpy as np
+
+def CreateTraceFile(filename,nbeats,ncouples):
+	""" Creates a trace file, all positions are NaN
+
+	Input:
+	filename (str) .npy file
+	nbeats (int) maximum number of trace points per couple
+	ncouples (int) number of couples
+
+	Output:
+	(numpy.memmap beats x couples x 2) writable memory map of the file
+	"""
+	trace=np.lib.format.open_memmap(filename,mode='w+',dtype=np.float32,shape=(nbeats,ncouples,2))
+	trace[:]=np.nan
+	WriteLength(filename,0)
+	return trace
+
+def LengthFileName(filename):
+	return filename+'.length'
+
+def WriteLength(filename,length):
+	""" Saves the number of spins that were written into a trace file (see ReadLength)
+	"""
+	with open(LengthFileName(filename),'w') as f:
+		f.write(str(length))
+
+def ReadLength(filename):
+	""" Number of spins that were written into a trace file, None if it is unknown
+	(trace files of earlier versions or an interrupted update of the length file)
+	"""
+	try:
+		with open(LengthFileName(filename)) as f:
+			return int(f.read())
+	except (OSError,ValueError):
+		return None
+
+def LoadTraces(filename,mmap=True):
+	""" Opens a trace file
+
+	Input:
+	filename (str) .npy file
+	mmap (bool) if True, the file is memory-mapped (read-only) instead of being read into memory
+
+	Output:
+	(numpy.array beats x couples x 2) the written part of the traces
+	"""
+	trace=np.load(filename,mmap_mode='r' if mmap==True else None)
+	length=ReadLength(filename)
+	if length is None:
+		length=TraceLength(trace)
+	return trace[:length]
+
+def TraceLength(trace):
+	""" Number of spins that were written into a trace array, estimated from the positions:
+	the rows up to the last row with any position (used if the length file is missing)
+	"""
+	written=np.flatnonzero(~np.isnan(trace).all(axis=(1,2)))
+	return int(written[-1])+1 if len(written)>0 else 0
+
+def ToJSON(filename,jsonfilename):
+	""" Converts a trace file into the JSON format of earlier versions:
+	a list of {'index': couple index, 'coordinates': [[x,y],...]}
+
+	Input:
+	filename (str) .npy trace file
+	jsonfilename (str) JSON file to write
+	"""
+	trace=LoadTraces(filename)
+	Q=list()
+	for index in range(trace.shape[1]):
+		Q.append({'index':index,'coordinates':trace[:,index].tolist()})
+	with open(jsonfilename,'w') as f:
+		json.dump(Q,f,sort_keys = True)
+
+if __name__=='__main__':
+	ToJSON(sys.argv[1],sys.argv[2])
@@ -0,0 +1,98 @@
+from panda3d.core import *
+
+class TraceLine():
+	""" A line strip that grows by one vertex per call of Append.
+	All vertices are kept in one vertex buffer and drawn by one GeomLinestrips
+	primitive, so appending costs the same no matter how long the line is.
+
+	If the length of the line is capped, only the most recent vertices are drawn.
+	Older vertices are dropped from the buffer whenever they make up half of it.
+	"""
+
+	def __init__(self,parent,color,thick=2.0,maxvertices=None):
+		""" Input:
+		parent (NodePath) node the line is attached to
+		color ((float,float,float,float)) color of the line
+		thick (float) line width
+		maxvertices (int) maximum number of vertices that are drawn, None for no limit
+		"""
+		self.maxvertices=maxvertices
+		self.vdata=GeomVertexData('trace',GeomVertexFormat.getV3(),Geom.UHDynamic)
+		self.writer=GeomVertexWriter(self.vdata,'vertex')
+		self.prim=GeomLinestrips(Geom.UHDynamic)
+		geom=Geom(self.vdata)
+		geom.addPrimitive(self.prim)
+		node=GeomNode('trace')
+		node.addGeom(geom)
+		self.nodepath=parent.attachNewNode(node)
+		self.nodepath.setColor(*color)
+		self.nodepath.setRenderModeThickness(thick)
+		self.nodepath.setShaderOff()
+		self.start=0 # first vertex that is drawn
+		self.count=0 # number of vertices in the buffer
+
+	def Append(self,x,y,z):
+		self.writer.setRow(self.count)
+		self.writer.addData3(x,y,z)
+		self.count+=1
+		if self.maxvertices is not None and self.count-self.start>self.maxvertices:
+			self.start=self.count-self.maxvertices
+			if self.start>=self.maxvertices:
+				self.Compact()
+		#the primitive always consists of one strip over the drawn vertices (a strip needs two vertices)
+		if self.count-self.start>=2:
+			self.prim.clearVertices()
+			self.prim.addConsecutiveVertices(self.start,self.count-self.start)
+			self.prim.closePrimitive()
+
+	def Compact(self):
+		""" Moves the drawn vertices to the front of the buffer
+		"""
+		reader=GeomVertexReader(self.vdata,'vertex')
+		reader.setRow(self.start)
+		points=[reader.getData3() for x in range(self.count-self.start)]
+		self.vdata.setNumRows(len(points))
+		self.writer=GeomVertexWriter(self.vdata,'vertex')
+		for p in points:
+			self.writer.setData3(p)
+		self.start=0
+		self.count=len(points)
+
+class TraceRenderer():
+	""" Draws the traces of the dance partners on the ballroom floor.
+	Every couple has one white and one black TraceLine, the white line follows
+	the following partner, the black line the leading partner.
+	"""
+
+	def __init__(self,parent,ncouples,thick=2.0,decimation=1,maxvertices=None,height=0.1):
+		""" Input:
+		parent (NodePath) node the lines are attached to
+		ncouples (int) number of couples
+		thick (float) line width
+		decimation (int) only every decimation-th call of Draw adds a vertex
+		maxvertices (int) maximum number of vertices per line, None for no limit
+		height (float) height of the lines above the floor
+		"""
+		self.decimation=decimation
+		self.height=height
+		self.calls=0
+		self.lines=[(TraceLine(parent,(1,1,1,0),thick,maxvertices),TraceLine(parent,(0,0,0,0),thick,maxvertices)) for x in range(ncouples)]
+
+	def Draw(self,white,black):
+		""" Appends the current positions of the dance partners to the lines
+
+		Input:
+		white,black (list(Point3)) positions of the following and the leading partners
+		"""
+		self.calls+=1
+		if (self.calls-1)%self.decimation!=0:
+			return
+		for (linewhite,lineblack),pw,pb in zip(self.lines,white,black):
+			linewhite.Append(pw[0],pw[1],self.height)
+			lineblack.Append(pb[0],pb[1],self.height)
+
+	def Vertices(self):
+		""" Output:
+		(int) number of vertices that are currently drawn
+		"""
+		return sum([l.count-l.start for lines in self.lines for l in lines])